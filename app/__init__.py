@@ -5,29 +5,52 @@ from flask_bcrypt import Bcrypt
 from flask_login import LoginManager
 from flask_wtf.csrf import CSRFProtect
 from flask_migrate import Migrate
+from werkzeug.middleware.proxy_fix import ProxyFix
 from datetime import datetime
 from app.config import Config
 from flask_socketio import SocketIO
+from app.compression import Compress
+from app.profiler import RequestProfiler
+from app.ratelimit import RateLimiter, LoadShedder
+from app.replicas import RoutingSession, ReplicaRouter
 
 # Initialize extensions
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={'class_': RoutingSession})
 bcrypt = Bcrypt()
 login_manager = LoginManager()
 csrf = CSRFProtect()
 migrate = Migrate()
 socketio = SocketIO()
+compress = Compress()
+profiler = RequestProfiler()
+load_shedder = LoadShedder()
+limiter = RateLimiter()
+replicas = ReplicaRouter(db)
 
 def create_app(config_class=Config):
     app = Flask(__name__)
     app.config.from_object(config_class)
+    if app.config.get('PROXY_COUNT'):
+        # Behind nginx/a load balancer: take the client address from X-Forwarded-For
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=app.config['PROXY_COUNT'], x_proto=app.config['PROXY_COUNT'])
 
+    # Shed load before any other request hook does work
+    load_shedder.init_app(app)
+    replicas.init_app(app)
     db.init_app(app)
     bcrypt.init_app(app)
     login_manager.init_app(app)
     csrf.init_app(app)
     migrate.init_app(app, db)
     socketio.init_app(app)
+    compress.init_app(app)
+    profiler.init_app(app)
+    limiter.init_app(app)
     
+    from app.storage import media_url, upload_grant, sweep_uploads_command
+    app.jinja_env.globals['media_url'] = media_url
+    app.jinja_env.globals['upload_grant'] = upload_grant
+
     @app.context_processor
     def inject_globals():
         current_vendor = None
@@ -42,6 +65,10 @@ def create_app(config_class=Config):
     from app.routes import main
     app.register_blueprint(main)
 
+    from app.archive import archive_command
+    app.cli.add_command(archive_command)
+    app.cli.add_command(sweep_uploads_command)
+
     return app
 
 from app import models
@@ -0,0 +1,94 @@
+import click
+from datetime import datetime
+from flask import current_app
+from flask.cli import with_appcontext
+from sqlalchemy import select, insert, delete, func, literal
+from app import db
+from app.models import Snack, Review, ArchivedSnack, ArchivedReview, VendorRatingRollup
+from app.queries import fresh_since
+from app.storage import get_storage
+
+SNACK_COLUMNS = ('name', 'description', 'price', 'media_url', 'media_type', 'poster_url', 'date_posted', 'vendor_id')
+REVIEW_COLUMNS = ('rating', 'comment', 'date_posted')
+
+def _archive_batch(snack_ids):
+    """Move these snacks and their reviews to the archive tables and roll their ratings up, in one transaction."""
+    snack_stats = dict(db.session.execute(
+        select(Snack.vendor_id, func.count(Snack.id)).where(Snack.id.in_(snack_ids)).group_by(Snack.vendor_id)).all())
+    review_stats = {vendor_id: (count, total) for vendor_id, count, total in db.session.execute(
+        select(Snack.vendor_id, func.count(Review.id), func.sum(Review.rating))
+        .join(Review).where(Snack.id.in_(snack_ids)).group_by(Snack.vendor_id)).all()}
+
+    # Archive rows get their own ids; reviews find their snack's new id through
+    # source_id among the rows this batch inserted (a reused live id may
+    # already be in the archive from an earlier run).
+    last_id = db.session.scalar(select(func.coalesce(func.max(ArchivedSnack.id), 0)))
+    db.session.execute(insert(ArchivedSnack).from_select(
+        ('source_id',) + SNACK_COLUMNS + ('archived_at',),
+        select(Snack.id, *(getattr(Snack, c) for c in SNACK_COLUMNS), literal(datetime.utcnow()))
+        .where(Snack.id.in_(snack_ids))))
+    db.session.execute(insert(ArchivedReview).from_select(
+        ('source_id', 'snack_id') + REVIEW_COLUMNS,
+        select(Review.id, ArchivedSnack.id, *(getattr(Review, c) for c in REVIEW_COLUMNS))
+        .join(ArchivedSnack, (ArchivedSnack.source_id == Review.snack_id) & (ArchivedSnack.id > last_id))
+        .where(Review.snack_id.in_(snack_ids))))
+
+    for vendor_id, snack_count in snack_stats.items():
+        review_count, rating_total = review_stats.get(vendor_id, (0, 0))
+        rollup = db.session.get(VendorRatingRollup, vendor_id)
+        if rollup is None:
+            rollup = VendorRatingRollup(vendor_id=vendor_id, snack_count=0, review_count=0, rating_total=0)
+            db.session.add(rollup)
+        rollup.snack_count += snack_count
+        rollup.review_count += review_count
+        rollup.rating_total += rating_total
+
+    db.session.execute(delete(Review).where(Review.snack_id.in_(snack_ids)))
+    db.session.execute(delete(Snack).where(Snack.id.in_(snack_ids)))
+    db.session.commit()
+
+def archive_expired_snacks(batch_size=500, delete_media=True):
+    """Move snacks past the 24h window (and their reviews) out of the live tables.
+
+    Works in batches of batch_size snacks, each its own short transaction, so
+    a large backlog never holds long locks on the hot tables. Archived media
+    files are deleted from storage, as the old cleanup task did; the rows keep
+    the history. Returns the number of snacks archived.
+    """
+    cutoff = fresh_since()
+    archived = 0
+    while True:
+        batch = db.session.execute(
+            select(Snack.id, Snack.media_url, Snack.poster_url)
+            .where(Snack.date_posted <= cutoff).order_by(Snack.id).limit(batch_size)).all()
+        if not batch:
+            return archived
+        _archive_batch([snack_id for snack_id, _, _ in batch])
+        archived += len(batch)
+        if delete_media:
+            storage = get_storage()
+            for _, media_key, poster_key in batch:
+                for key in (media_key, poster_key):
+                    if key:
+                        try:
+                            storage.delete(key)
+                        except Exception:
+                            current_app.logger.exception('Could not delete archived media %s', key)
+        if len(batch) < batch_size:
+            return archived
+
+def forget_vendor(vendor):
+    """Drop a vendor's archived snacks, reviews and rollup; call before deleting the vendor."""
+    archived_ids = select(ArchivedSnack.id).where(ArchivedSnack.vendor_id == vendor.id)
+    db.session.execute(delete(ArchivedReview).where(ArchivedReview.snack_id.in_(archived_ids)))
+    db.session.execute(delete(ArchivedSnack).where(ArchivedSnack.vendor_id == vendor.id))
+    db.session.execute(delete(VendorRatingRollup).where(VendorRatingRollup.vendor_id == vendor.id))
+
+@click.command('archive-snacks')
+@click.option('--batch-size', default=500, show_default=True, help='Snacks moved per transaction.')
+@click.option('--keep-media', is_flag=True, help="Don't delete archived snacks' media files.")
+@with_appcontext
+def archive_command(batch_size, keep_media):
+    """Move expired snacks and their reviews to the archive tables."""
+    archived = archive_expired_snacks(batch_size, delete_media=not keep_media)
+    click.echo(f'Archived {archived} expired snacks.')
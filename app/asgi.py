@@ -0,0 +1,218 @@
+"""Optional async (ASGI) serving mode.
+
+The public read routes (home, search_snacks, search_vendors, vendor_profile)
+run as async views on an async SQLAlchemy engine, using the same models,
+statements (app/queries.py) and templates as the Flask routes. Every other
+request, including all writes, is passed to the regular Flask app.
+
+    uvicorn app.asgi:create_asgi_app --factory --workers 4
+
+Needs the packages in requirements-async.txt. Socket.IO (live feed, chat)
+still needs the gevent deployment from the Procfile, so run this for read
+traffic behind a router that sends /socket.io/ to the gevent nodes.
+
+The request profiler (app/profiler.py) skips the async views: their requests
+share the event loop thread, so its stack samples would mix them together.
+Requests passed through to the Flask app are profiled as usual.
+"""
+import io
+import sys
+from datetime import datetime
+from asgiref.sync import sync_to_async
+from asgiref.wsgi import WsgiToAsgi
+from flask import current_app, g, request, session
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from werkzeug.exceptions import HTTPException
+
+from app import create_app, db, queries
+from app.config import Config
+from app.forms import SearchForm, VendorSearchForm
+from app.models import Vendor
+from app.zone_feeds import ZoneFeeds
+from app.ranking import SnackRanking
+
+ASYNC_DRIVERS = {
+    'sqlite': 'sqlite+aiosqlite',
+    'postgresql': 'postgresql+asyncpg',
+    'postgres': 'postgresql+asyncpg',
+}
+
+def async_database_url(app):
+    """The app's database URL with the driver swapped for its asyncio equivalent."""
+    if app.config.get('ASYNC_DATABASE_URI'):
+        return app.config['ASYNC_DATABASE_URI']
+    with app.app_context():
+        url = db.engine.url  # Flask-SQLAlchemy has already resolved relative sqlite paths
+    return url.set(drivername=ASYNC_DRIVERS.get(url.get_backend_name(), url.drivername))
+
+async def live_index(db_session, index_class):
+    """index_class.get(), rebuilt from the database with the async session when stale."""
+    index = index_class.get(current_app, rebuild=False)
+    if index.stale():
+        with index.capture_changes() as queued:
+            index.load(*[(await db_session.execute(stmt)).all() for stmt in index.statements()], queued=queued)
+    return index
+
+async def home(db_session):
+    search_form = SearchForm()
+    zone = request.args.get('zone', '').strip()
+    state = request.args.get('state', '').strip() if not zone else ''
+    feeds = await live_index(db_session, ZoneFeeds)
+    snack_ranking = await live_index(db_session, SnackRanking)
+    snack_ids = feeds.snack_ids(zone, state)
+    within = set(snack_ids) if zone or state else None
+    trending_ids, top_rated_ids = snack_ranking.trending(within=within), snack_ranking.top_rated(within=within)
+    snacks = (await db_session.scalars(queries.snacks_by_ids(set(snack_ids + trending_ids + top_rated_ids)))).all()
+    vendors = (await db_session.scalars(queries.all_vendors())).all()
+    ads = (await db_session.scalars(queries.active_ads())).all()
+    return 'home.html', dict(snacks=queries.in_id_order(snacks, snack_ids), vendors=vendors,
+                             search_form=search_form, ads=ads, zone=zone, state=state, facets=feeds.facets(),
+                             trending=queries.in_id_order(snacks, trending_ids),
+                             top_rated=queries.in_id_order(snacks, top_rated_ids),
+                             ratings=snack_ranking.stats(trending_ids + top_rated_ids))
+
+async def search_snacks(db_session):
+    search_form = SearchForm(request.args)
+    results = []
+    if search_form.validate():
+        location_zone = search_form.location_zone.data
+        feeds = await live_index(db_session, ZoneFeeds)
+        snack_ids = feeds.zone_search_ids(location_zone)
+        stmt = queries.search_snacks(location_zone, search_form.snack_type.data, snack_ids)
+        results = (await db_session.scalars(stmt)).all()
+    return 'search_results.html', dict(search_form=search_form, results=results)
+
+async def search_vendors(db_session):
+    search_form = VendorSearchForm(request.args)
+    stmt = queries.search_vendors(search_form.business_name.data, search_form.location_zone.data)
+    results = (await db_session.scalars(stmt)).all()
+    return 'vendor_search_results.html', dict(search_form=search_form, results=results)
+
+async def vendor_profile(db_session, vendor_id):
+    vendor = await db_session.get(Vendor, vendor_id)
+    if not vendor:
+        return 'Vendor not found', 404
+    snacks_with_reviews = (await db_session.execute(queries.vendor_snacks_with_rating(vendor.id))).all()
+    rating_totals = (await db_session.execute(queries.vendor_rating_totals(vendor.id))).one()
+    return 'vendor_profile.html', dict(vendor=vendor, snacks=snacks_with_reviews, rating_totals=rating_totals)
+
+ASYNC_VIEWS = {
+    'main.home': home,
+    'main.search_snacks': search_snacks,
+    'main.search_vendors': search_vendors,
+    'main.vendor_profile': vendor_profile,
+}
+
+def _environ(scope, body=b'', proxy_count=0):
+    server = scope.get('server') or ('localhost', 80)
+    client = scope.get('client') or ('', 0)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', ''),
+        'PATH_INFO': scope['path'],
+        'QUERY_STRING': scope['query_string'].decode('latin-1'),
+        'SERVER_NAME': server[0],
+        'SERVER_PORT': str(server[1]),
+        'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+        'REMOTE_ADDR': client[0],
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': io.BytesIO(body),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': False,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False,
+    }
+    for name, value in scope.get('headers', []):
+        name = name.decode('latin-1').upper().replace('-', '_')
+        value = value.decode('latin-1')
+        if name in ('CONTENT_TYPE', 'CONTENT_LENGTH'):
+            environ[name] = value
+        else:
+            key = f'HTTP_{name}'
+            environ[key] = f'{environ[key]},{value}' if key in environ else value
+    if proxy_count:
+        # What ProxyFix does for the WSGI app: trust the last proxy_count hops
+        for header, key in (('HTTP_X_FORWARDED_FOR', 'REMOTE_ADDR'), ('HTTP_X_FORWARDED_PROTO', 'wsgi.url_scheme')):
+            values = [value.strip() for value in environ.get(header, '').split(',')]
+            if environ.get(header) and len(values) >= proxy_count:
+                environ[key] = values[-proxy_count]
+    return environ
+
+class AsyncReadApp:
+    """ASGI app: async views for the read path, the Flask app (via WsgiToAsgi) for the rest."""
+
+    def __init__(self, flask_app):
+        self.flask_app = flask_app
+        self.wsgi = WsgiToAsgi(flask_app)
+        self.engine = create_async_engine(async_database_url(flask_app),
+                                          **flask_app.config.get('ASYNC_ENGINE_OPTIONS', {}))
+        self.sessionmaker = async_sessionmaker(self.engine, expire_on_commit=False)
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            return await self._lifespan(receive, send)
+        if scope['type'] != 'http' or scope['method'] not in ('GET', 'HEAD'):
+            return await self.wsgi(scope, receive, send)
+
+        environ = _environ(scope, proxy_count=self.flask_app.config.get('PROXY_COUNT', 0))
+        adapter = self.flask_app.url_map.bind_to_environ(environ)
+        try:
+            endpoint, view_args = adapter.match(method=scope['method'])
+        except HTTPException:
+            endpoint, view_args = None, {}
+        view = ASYNC_VIEWS.get(endpoint)
+        if view is None:
+            return await self.wsgi(scope, receive, send)
+
+        response = await self._dispatch(environ, view, view_args)
+        await send({
+            'type': 'http.response.start',
+            'status': response.status_code,
+            'headers': [(k.lower().encode('latin-1'), v.encode('latin-1')) for k, v in response.headers.items()],
+        })
+        body = b'' if scope['method'] == 'HEAD' else b''.join(response.iter_encoded())
+        await send({'type': 'http.response.body', 'body': body})
+
+    async def _dispatch(self, environ, view, view_args):
+        app = self.flask_app
+        with app.request_context(environ):
+            g.async_view = True
+            try:
+                # before_request hooks (rate limiter, profiler) may block on
+                # Redis/SQLite/the database, so keep them off the event loop.
+                rv = await sync_to_async(app.preprocess_request, thread_sensitive=False)()
+                if rv is None:
+                    async with self.sessionmaker() as db_session:
+                        rv = await view(db_session, **view_args)
+                        if isinstance(rv[0], str) and isinstance(rv[1], dict):
+                            rv = await self._render(db_session, *rv)
+                response = app.make_response(rv)
+                return app.process_response(response)
+            except Exception as e:
+                return app.make_response(app.handle_user_exception(e)) if isinstance(e, HTTPException) \
+                    else app.handle_exception(e)
+
+    async def _render(self, db_session, template, context):
+        # Rendered through the Jinja env directly: the app's context processors
+        # would look up current_vendor with the blocking session.
+        vendor_id = session.get('vendor_id')
+        context.update(
+            config=self.flask_app.config, request=request, session=session, g=g,
+            now=datetime.utcnow(),
+            current_vendor=await db_session.get(Vendor, vendor_id) if vendor_id else None,
+        )
+        return self.flask_app.jinja_env.get_template(template).render(context)
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await self.engine.dispose()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+def create_asgi_app(config_class=Config):
+    return AsyncReadApp(create_app(config_class))
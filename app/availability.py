@@ -0,0 +1,119 @@
+import hashlib
+import math
+from sqlalchemy import select, or_, func
+from app import db
+from app.indexes import LiveIndex
+from app.models import Vendor
+
+# Vendor columns with a unique constraint that registration checks up front
+UNIQUE_FIELDS = ('email', 'business_name', 'whatsapp_number')
+TAKEN_MESSAGES = {
+    'email': 'That email is already registered. Please choose a different one.',
+    'business_name': 'That business name is already taken. Please choose a different one.',
+    'whatsapp_number': 'That WhatsApp number is already registered. Please use a different one.',
+}
+UNKNOWN_REFERRAL_MESSAGE = 'No vendor has that referral code.'
+
+class BloomFilter:
+    """Set membership in a fixed bit array: no false negatives, about
+    error_rate false positives once `capacity` items have been added."""
+
+    def __init__(self, capacity, error_rate=0.01):
+        self.capacity = max(capacity, 1)
+        self.size = max(64, int(-self.capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / self.capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, item):
+        # Double hashing: k positions from the two halves of one digest
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        h1, h2 = int.from_bytes(digest[:8], 'little'), int.from_bytes(digest[8:], 'little') | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hashes)]
+
+    def add(self, item):
+        for position in self._positions(item):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, item):
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(item))
+
+class TakenValues(LiveIndex):
+    """Bloom filter of every vendor's email, business name and WhatsApp number.
+
+    A miss means the value is free and needs no query, which is the usual
+    case while someone types into the registration form. A hit may be a false
+    positive and is confirmed against the database. Values freed by renames or
+    deletes stay "maybe taken" until the next rebuild; the unique constraints
+    still catch anything another worker registered since.
+    """
+
+    extension = 'taken_values'
+    rebuild_setting = 'AVAILABILITY_REBUILD_SECONDS'
+    rebuild_default = 600
+
+    def _reset(self):
+        self._bloom = None
+
+    def stale(self):
+        return super().stale() or self._bloom.count > self._bloom.capacity
+
+    def rebuild(self):
+        with self.capture_changes() as queued:
+            vendor_count = db.session.scalar(select(func.count(Vendor.id)))
+            # Room to grow before the false positive rate degrades and forces a rebuild
+            bloom = BloomFilter(len(UNIQUE_FIELDS) * (2 * vendor_count + 1000))
+            # Streamed into the filter rather than loaded as rows
+            rows = db.session.execute(select(*(getattr(Vendor, field) for field in UNIQUE_FIELDS)).execution_options(yield_per=1000))
+            for row in rows:
+                for field, value in zip(UNIQUE_FIELDS, row):
+                    bloom.add(f'{field}:{value}')
+            with self._lock:
+                self._bloom = bloom
+                self._replay(queued)
+
+    def _apply(self, changes):
+        for kind, action, row_id, values in changes:
+            if kind == 'vendor' and action == 'upsert':
+                self._add(values)
+
+    def _add(self, values):
+        for field in UNIQUE_FIELDS:
+            if values.get(field):
+                self._bloom.add(f'{field}:{values[field]}')
+
+    def add(self, values):
+        with self._lock:
+            self._add(values)
+
+    def maybe_taken(self, field, value):
+        with self._lock:
+            return f'{field}:{value}' in self._bloom
+
+get_taken_values = TakenValues.get
+
+def check_registration(email=None, business_name=None, whatsapp_number=None, referral_code=None):
+    """(fields already taken, id of the vendor owning referral_code or None), in at most one query.
+
+    Values the bloom filter rules out are never queried; the rest, and the
+    referral code, are looked up together.
+    """
+    taken_values = get_taken_values()
+    values = {'email': email, 'business_name': business_name, 'whatsapp_number': whatsapp_number}
+    candidates = {field: value for field, value in values.items()
+                  if value and taken_values.maybe_taken(field, value)}
+    conditions = [getattr(Vendor, field) == value for field, value in candidates.items()]
+    if referral_code:
+        conditions.append(Vendor.referral_code == referral_code)
+    taken, referrer_id = set(), None
+    if not conditions:
+        return taken, referrer_id
+    stmt = select(Vendor.id, Vendor.referral_code, *(getattr(Vendor, field) for field in UNIQUE_FIELDS)).where(or_(*conditions))
+    for vendor_id, code, *row in db.session.execute(stmt):
+        for field, value in zip(UNIQUE_FIELDS, row):
+            if field in candidates and candidates[field] == value:
+                taken.add(field)
+        if referral_code and code == referral_code:
+            referrer_id = vendor_id
+    return taken, referrer_id
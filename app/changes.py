@@ -0,0 +1,59 @@
+from datetime import datetime
+from sqlalchemy import event
+from app.models import Vendor, Snack, Review
+from app.replicas import RoutingSession
+
+# In-memory indexes (typeahead, zone feeds, ranking, taken names) follow snack, vendor and
+# review writes through these hooks. Changes are collected at flush and handed
+# to the registered callbacks once the transaction commits, so rolled-back
+# rows never show up. Each change is (kind, action, id, values) with action
+# 'upsert' or 'delete'; values is None for snack and vendor deletes.
+_callbacks = []
+
+def on_commit(callback):
+    """Register callback(changes), called in the app context after each commit that touched tracked rows."""
+    _callbacks.append(callback)
+    return callback
+
+def _row_change(obj, action):
+    if isinstance(obj, Snack):
+        values = None if action == 'delete' else {
+            'name': obj.name,
+            'date_posted': obj.date_posted or datetime.utcnow(),
+            'vendor_id': obj.vendor_id,
+        }
+        return ('snack', action, obj.id, values)
+    if isinstance(obj, Vendor):
+        values = None if action == 'delete' else {
+            'business_name': obj.business_name,
+            'email': obj.email,
+            'whatsapp_number': obj.whatsapp_number,
+            'location_zone': obj.location_zone,
+            'state': obj.state,
+            'is_verified': bool(obj.is_verified),
+        }
+        return ('vendor', action, obj.id, values)
+    if isinstance(obj, Review):
+        # Kept for deletes too: a removed rating has to be taken back out of the totals
+        return ('review', action, obj.id, {'snack_id': obj.snack_id, 'rating': obj.rating})
+    return None
+
+@event.listens_for(RoutingSession, 'after_flush')
+def _collect_changes(db_session, flush_context):
+    changes = db_session.info.setdefault('row_changes', [])
+    for objects, action in ((db_session.new, 'upsert'), (db_session.dirty, 'upsert'), (db_session.deleted, 'delete')):
+        for obj in objects:
+            change = _row_change(obj, action)
+            if change:
+                changes.append(change)
+
+@event.listens_for(RoutingSession, 'after_commit')
+def _apply_changes(db_session):
+    changes = db_session.info.pop('row_changes', None)
+    if changes:
+        for callback in _callbacks:
+            callback(changes)
+
+@event.listens_for(RoutingSession, 'after_rollback')
+def _discard_changes(db_session):
+    db_session.info.pop('row_changes', None)
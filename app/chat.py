@@ -0,0 +1,99 @@
+from datetime import datetime
+from sqlalchemy import or_, func, select, delete
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import joinedload
+from app import db, socketio
+from app.models import Conversation, ChatMessage
+from app.events import Coalescer
+from app.replicas import use_primary
+
+def _pair(vendor_id, other_id):
+    """The two ids in the order Conversation stores them."""
+    return (vendor_id, other_id) if vendor_id < other_id else (other_id, vendor_id)
+
+def find_conversation(vendor_id, other_id):
+    low, high = _pair(vendor_id, other_id)
+    return Conversation.query.filter_by(vendor_a_id=low, vendor_b_id=high).first()
+
+def get_or_create_conversation(vendor_id, other_id):
+    # A stale replica would miss a conversation the other party just started
+    with use_primary():
+        conversation = find_conversation(vendor_id, other_id)
+    if conversation:
+        return conversation
+    low, high = _pair(vendor_id, other_id)
+    try:
+        conversation = Conversation(vendor_a_id=low, vendor_b_id=high)
+        db.session.add(conversation)
+        db.session.commit()
+    except IntegrityError:
+        # The other party opened the chat at the same moment
+        db.session.rollback()
+        with use_primary():
+            conversation = find_conversation(vendor_id, other_id)
+    return conversation
+
+def inbox_for(vendor_id, limit=50):
+    """Conversations a vendor takes part in, newest first, with the other party loaded."""
+    return Conversation.query \
+        .options(joinedload(Conversation.vendor_a), joinedload(Conversation.vendor_b)) \
+        .filter(or_(Conversation.vendor_a_id == vendor_id, Conversation.vendor_b_id == vendor_id)) \
+        .order_by(Conversation.last_message_at.desc()) \
+        .limit(limit) \
+        .all()
+
+def forget_conversations(vendor_id):
+    """Delete a vendor's conversations and their messages; call before deleting the vendor."""
+    conversation_ids = select(Conversation.id).where(
+        or_(Conversation.vendor_a_id == vendor_id, Conversation.vendor_b_id == vendor_id))
+    db.session.execute(delete(ChatMessage).where(ChatMessage.conversation_id.in_(conversation_ids)))
+    db.session.execute(delete(Conversation).where(
+        or_(Conversation.vendor_a_id == vendor_id, Conversation.vendor_b_id == vendor_id)))
+
+def record_message(conversation, sender_id, body):
+    """Store a message and bump the conversation index in the same transaction."""
+    message = ChatMessage(conversation_id=conversation.id, sender_id=sender_id, body=body)
+    db.session.add(message)
+
+    unread_column = 'vendor_b_unread' if sender_id == conversation.vendor_a_id else 'vendor_a_unread'
+    db.session.query(Conversation).filter_by(id=conversation.id).update({
+        'last_message': body[:200],
+        'last_message_at': datetime.utcnow(),
+        'last_sender_id': sender_id,
+        unread_column: getattr(Conversation, unread_column) + 1,
+    }, synchronize_session=False)
+    db.session.commit()
+    return message
+
+def queue_read_receipt(conversation, reader_id, message_id):
+    key = (conversation.id, 'vendor_a' if reader_id == conversation.vendor_a_id else 'vendor_b')
+    _read_receipts.add(key, message_id)
+
+def _flush_reads(reads):
+    receipts = []
+    for (conversation_id, side), message_id in reads.items():
+        conversation = db.session.get(Conversation, conversation_id)
+        if not conversation:
+            continue
+        reader_id = getattr(conversation, f'{side}_id')
+        # The id comes from the client: never past this conversation's last message
+        latest_id = db.session.query(func.max(ChatMessage.id)).filter(
+            ChatMessage.conversation_id == conversation_id).scalar() or 0
+        last_read_id = max(getattr(conversation, f'{side}_last_read_id'), min(message_id, latest_id))
+        # Messages that arrived after the acknowledged one are still unread.
+        unread = db.session.query(func.count(ChatMessage.id)).filter(
+            ChatMessage.conversation_id == conversation_id,
+            ChatMessage.id > last_read_id,
+            ChatMessage.sender_id != reader_id,
+        ).scalar()
+        setattr(conversation, f'{side}_last_read_id', last_read_id)
+        setattr(conversation, f'{side}_unread', unread)
+        receipts.append((conversation.room, {'reader_id': reader_id, 'message_id': last_read_id}))
+    db.session.commit()
+
+    for room, receipt in receipts:
+        socketio.emit('read', receipt, to=room)
+
+# Read acknowledgments are collected here and written in one batch, instead of
+# one UPDATE per message the reader scrolls past.
+_read_receipts = Coalescer(_flush_reads, 'CHAT_READ_FLUSH_SECONDS', combine=max)
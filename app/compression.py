@@ -0,0 +1,140 @@
+import os
+import gzip
+import zlib
+import mimetypes
+import click
+from flask import request, current_app, send_from_directory
+from flask.cli import with_appcontext
+from werkzeug.security import safe_join
+
+try:
+    import brotli
+except ImportError:  # Brotli is optional; gzip is always available
+    brotli = None
+
+COMPRESSIBLE_MIMETYPES = {
+    'text/html', 'text/css', 'text/plain', 'text/xml', 'text/javascript',
+    'application/javascript', 'application/json', 'application/xml', 'image/svg+xml',
+}
+PRECOMPRESS_EXTENSIONS = ('.css', '.js', '.svg', '.html', '.json', '.txt')
+# Order of preference when the client accepts several encodings
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+def accepted_encodings():
+    """Encodings from Accept-Encoding that we can produce, best first."""
+    accepted = request.accept_encodings
+    return [name for name, _ in ENCODINGS
+            if accepted[name] and (name != 'br' or brotli is not None)]
+
+def _compressor(encoding, config):
+    if encoding == 'br':
+        compressor = brotli.Compressor(quality=config.get('COMPRESS_BR_LEVEL', 4))
+        return compressor.process, compressor.flush, compressor.finish
+    compressor = zlib.compressobj(config.get('COMPRESS_LEVEL', 6), zlib.DEFLATED, 31)
+    return (compressor.compress,
+            lambda: compressor.flush(zlib.Z_SYNC_FLUSH),
+            compressor.flush)
+
+def _compress_stream(chunks, encoding, config):
+    # Flush after every chunk so streamed pages still reach the client incrementally.
+    compress, flush, finish = _compressor(encoding, config)
+    try:
+        for chunk in chunks:
+            if isinstance(chunk, str):
+                chunk = chunk.encode('utf-8')
+            if chunk:
+                yield compress(chunk) + flush()
+        yield finish()
+    finally:
+        if hasattr(chunks, 'close'):
+            chunks.close()
+
+class Compress:
+    """gzip/brotli compression for dynamic responses, plus serving of
+    precompressed static files built by `flask compress-static`."""
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.after_request(self.after_request)
+        if app.has_static_folder:
+            app.view_functions['static'] = self.send_static_file
+        app.cli.add_command(compress_static)
+
+    def after_request(self, response):
+        config = current_app.config
+        if not config.get('COMPRESS_ENABLED', True):
+            return response
+        if (response.mimetype not in COMPRESSIBLE_MIMETYPES
+                or response.status_code < 200 or response.status_code in (204, 206, 304)
+                or 'Content-Encoding' in response.headers
+                or response.direct_passthrough
+                or request.method == 'HEAD'
+                or 'no-transform' in response.headers.get('Cache-Control', '')):
+            return response
+
+        response.vary.add('Accept-Encoding')
+        encodings = accepted_encodings()
+        if not encodings:
+            return response
+        encoding = encodings[0]
+
+        if response.is_streamed:
+            response.response = _compress_stream(response.response, encoding, dict(config))
+            response.headers.pop('Content-Length', None)
+        else:
+            data = response.get_data()
+            if len(data) < config.get('COMPRESS_MIN_SIZE', 500):
+                return response
+            compress, _, finish = _compressor(encoding, config)
+            response.set_data(compress(data) + finish())
+        response.headers['Content-Encoding'] = encoding
+        return response
+
+    def send_static_file(self, filename):
+        app = current_app
+        for encoding in accepted_encodings():
+            extension = dict(ENCODINGS)[encoding]
+            variant = safe_join(app.static_folder, filename + extension)
+            if variant and os.path.isfile(variant):
+                response = send_from_directory(app.static_folder, filename + extension,
+                                               max_age=app.get_send_file_max_age(filename))
+                response.headers['Content-Encoding'] = encoding
+                response.mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+                response.vary.add('Accept-Encoding')
+                return response
+        response = app.send_static_file(filename)
+        if response.mimetype in COMPRESSIBLE_MIMETYPES:
+            response.vary.add('Accept-Encoding')
+        return response
+
+@click.command('compress-static')
+@click.option('--force', is_flag=True, help='Rebuild variants even if they are up to date.')
+@with_appcontext
+def compress_static(force):
+    """Write .gz (and .br when Brotli is installed) next to each static text asset."""
+    static_folder = current_app.static_folder
+    min_size = current_app.config.get('COMPRESS_MIN_SIZE', 500)
+    written = 0
+    for root, _, files in os.walk(static_folder):
+        for name in files:
+            if not name.endswith(PRECOMPRESS_EXTENSIONS):
+                continue
+            path = os.path.join(root, name)
+            if os.path.getsize(path) < min_size:
+                continue
+            with open(path, 'rb') as f:
+                data = f.read()
+            variants = [('.gz', lambda d: gzip.compress(d, compresslevel=9, mtime=0))]
+            if brotli is not None:
+                variants.append(('.br', lambda d: brotli.compress(d, quality=11)))
+            for extension, compress in variants:
+                target = path + extension
+                if not force and os.path.exists(target) and os.path.getmtime(target) >= os.path.getmtime(path):
+                    continue
+                with open(target, 'wb') as f:
+                    f.write(compress(data))
+                written += 1
+    click.echo(f'Wrote {written} precompressed static files.')
@@ -3,4 +3,78 @@ import os
 class Config:
     SECRET_KEY = os.environ.get('SECRET_KEY') or 'your_super_secret_key_here'
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL') or 'sqlite:///site.db'
-    SQLALCHEMY_TRACK_MODIFICATIONS = False
\ No newline at end of file
+    SQLALCHEMY_TRACK_MODIFICATIONS = False
+    # Comma-separated read replica URLs; read-only GET pages read from these (see REPLICA_ENDPOINTS in app/replicas.py)
+    SQLALCHEMY_REPLICA_URIS = [uri for uri in os.environ.get('DATABASE_REPLICA_URLS', '').split(',') if uri]
+    REPLICA_MAX_LAG = float(os.environ.get('REPLICA_MAX_LAG', 10))
+    REPLICA_CHECK_INTERVAL = float(os.environ.get('REPLICA_CHECK_INTERVAL', 5))
+    REPLICA_STICKY_SECONDS = float(os.environ.get('REPLICA_STICKY_SECONDS', 10))
+    FEED_COALESCE_SECONDS = float(os.environ.get('FEED_COALESCE_SECONDS', 2))
+    CHAT_READ_FLUSH_SECONDS = float(os.environ.get('CHAT_READ_FLUSH_SECONDS', 2))
+
+    # Response compression (see app/compression.py)
+    COMPRESS_ENABLED = os.environ.get('COMPRESS_ENABLED', '1') == '1'
+    COMPRESS_MIN_SIZE = int(os.environ.get('COMPRESS_MIN_SIZE', 500))
+    COMPRESS_LEVEL = 6
+    COMPRESS_BR_LEVEL = 4
+
+    # Media serving (see app/media.py). Set MEDIA_ACCEL_REDIRECT_PREFIX when nginx
+    # fronts the app with an internal location aliased to app/static.
+    MEDIA_ACCEL_REDIRECT_PREFIX = os.environ.get('MEDIA_ACCEL_REDIRECT_PREFIX')
+    USE_X_SENDFILE = os.environ.get('USE_X_SENDFILE') == '1'
+    MEDIA_MAX_AGE = int(os.environ.get('MEDIA_MAX_AGE', 7 * 24 * 3600))
+
+    # Media storage (see app/storage.py): 'local' keeps uploads under app/static,
+    # 's3' uses an S3-compatible bucket (S3_ENDPOINT_URL points at MinIO etc.)
+    MEDIA_STORAGE = os.environ.get('MEDIA_STORAGE', 'local')
+    S3_BUCKET = os.environ.get('S3_BUCKET')
+    S3_ENDPOINT_URL = os.environ.get('S3_ENDPOINT_URL')
+    S3_REGION = os.environ.get('S3_REGION')
+    S3_ACCESS_KEY_ID = os.environ.get('S3_ACCESS_KEY_ID')
+    S3_SECRET_ACCESS_KEY = os.environ.get('S3_SECRET_ACCESS_KEY')
+    MEDIA_PUBLIC_URL = os.environ.get('MEDIA_PUBLIC_URL')
+    MEDIA_DIRECT_UPLOADS = os.environ.get('MEDIA_DIRECT_UPLOADS', '1') == '1'
+    MEDIA_UPLOAD_MAX_BYTES = int(os.environ.get('MEDIA_UPLOAD_MAX_BYTES', 50 * 1024 * 1024))
+    MEDIA_UPLOAD_EXPIRES = 3600
+    # Any request body, form uploads included: the largest upload plus room for the other fields
+    MAX_CONTENT_LENGTH = MEDIA_UPLOAD_MAX_BYTES + 1024 * 1024
+
+    # Search typeahead; each worker fully rebuilds its in-memory index this often
+    SUGGEST_REBUILD_SECONDS = int(os.environ.get('SUGGEST_REBUILD_SECONDS', 300))
+
+    # Per-zone/state snack feeds held in memory; each worker fully rebuilds them this often
+    ZONE_FEED_REBUILD_SECONDS = int(os.environ.get('ZONE_FEED_REBUILD_SECONDS', 60))
+    RANKING_REBUILD_SECONDS = int(os.environ.get('RANKING_REBUILD_SECONDS', 60))
+
+    # Streamed listing pages (admin dashboard, vendor list) load rows in batches of this size
+    STREAM_YIELD_PER = int(os.environ.get('STREAM_YIELD_PER', 200))
+
+    # Request profiler: admins add ?_profile=1 (or an X-Profile-Token header);
+    # PROFILER_SAMPLE_RATE also profiles that fraction of all requests
+    PROFILER_SAMPLE_RATE = float(os.environ.get('PROFILER_SAMPLE_RATE', 0))
+    PROFILER_INTERVAL = 0.005
+    PROFILER_KEEP = 100
+    PROFILER_DIR = os.environ.get('PROFILER_DIR')
+
+    # Registration uniqueness prefilter (see app/availability.py); rebuilt this often per worker
+    AVAILABILITY_REBUILD_SECONDS = int(os.environ.get('AVAILABILITY_REBUILD_SECONDS', 600))
+
+    # Rate limits declared with @rate_limit on routes (see app/ratelimit.py).
+    # 'memory' keeps each worker's token buckets to itself; 'redis' shares them,
+    # and 'local' shares them between the workers on one host through a SQLite file.
+    RATELIMIT_ENABLED = os.environ.get('RATELIMIT_ENABLED', '1') == '1'
+    RATELIMIT_STORAGE = os.environ.get('RATELIMIT_STORAGE', 'memory')
+    RATELIMIT_REDIS_URL = os.environ.get('RATELIMIT_REDIS_URL', 'redis://localhost:6379/0')
+    RATELIMIT_LOCAL_PATH = os.environ.get('RATELIMIT_LOCAL_PATH')
+    # Number of proxies in front of the app whose X-Forwarded-For is trusted. Left at
+    # 0 behind a load balancer, every request carries the balancer's address and all
+    # clients share one per-IP rate limit bucket. Render (RENDER) and Heroku (DYNO)
+    # put one balancer in front, so it defaults to 1 there; the Procfile sets it too.
+    PROXY_COUNT = int(os.environ.get('PROXY_COUNT', 1 if os.environ.get('RENDER') or os.environ.get('DYNO') else 0))
+    # Each worker answers 503 once this many requests are in flight (0 disables)
+    LOAD_SHED_MAX_IN_FLIGHT = int(os.environ.get('LOAD_SHED_MAX_IN_FLIGHT', 200))
+    LOAD_SHED_RETRY_AFTER = 1
+
+    # Async serving mode (app/asgi.py); defaults to DATABASE_URL with an asyncio driver
+    ASYNC_DATABASE_URI = os.environ.get('ASYNC_DATABASE_URL')
+    ASYNC_ENGINE_OPTIONS = {'pool_pre_ping': True}
\ No newline at end of file
@@ -1,20 +1,116 @@
-from flask_socketio import emit, join_room
-from app import socketio
+import threading
+from flask import current_app, session
+from flask_socketio import emit, join_room, leave_room
+from app import socketio, db
+from app.models import Conversation
+
+class Coalescer:
+    """Collects updates and hands them to flush() in one batch per window.
+
+    add() files a value under a key, merged by combine() with one already
+    waiting (by default the later value wins). The first add after a flush
+    starts a background task that waits the `delay_setting` config value, then
+    calls flush({key: value}) inside an app context.
+    """
+
+    def __init__(self, flush, delay_setting, combine=lambda waiting, value: value):
+        self.flush = flush
+        self.delay_setting = delay_setting
+        self.combine = combine
+        self._pending = {}
+        self._scheduled = False
+        self._lock = threading.Lock()
+
+    def add(self, key, value):
+        with self._lock:
+            if key in self._pending:
+                value = self.combine(self._pending[key], value)
+            self._pending[key] = value
+            schedule = not self._scheduled
+            self._scheduled = True
+
+        if schedule:
+            app = current_app._get_current_object()
+            socketio.start_background_task(self._flush_after, app, app.config.get(self.delay_setting, 2))
+
+    def _flush_after(self, app, delay):
+        socketio.sleep(delay)
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            self._scheduled = False
+        with app.app_context():
+            self.flush(pending)
+
+# Payloads come straight from the browser: anything malformed is ignored
+def _payload(data):
+    return data if isinstance(data, dict) else {}
+
+def _int_field(data, key):
+    try:
+        return int(data.get(key) or 0)
+    except (TypeError, ValueError):
+        return 0
+
+def _str_field(data, key):
+    value = data.get(key)
+    return value if isinstance(value, str) else None
+
+def _conversation_for_current_vendor(data):
+    # Only the two participants may join or post to a conversation room
+    vendor_id = session.get('vendor_id')
+    conversation_id = _int_field(data, 'conversation_id')
+    conversation = db.session.get(Conversation, conversation_id) if conversation_id else None
+    if not vendor_id or not conversation or vendor_id not in (conversation.vendor_a_id, conversation.vendor_b_id):
+        return None, None
+    return conversation, vendor_id
 
 @socketio.on('join')
 def on_join(data):
-    room = data['room']
+    data = _payload(data)
+    conversation, vendor_id = _conversation_for_current_vendor(data)
+    if not conversation:
+        return
+    join_room(conversation.room)
+    emit('status', {'msg': 'A user has entered the room.'}, room=conversation.room)
+
+@socketio.on('join_feed')
+def on_join_feed(data):
+    # Home page visitors listen for fresh snacks in their zone/state (or everywhere)
+    data = _payload(data)
+    previous = session.get('feed_room')
+    if previous:
+        leave_room(previous)
+    room = feed_room(_str_field(data, 'zone'), _str_field(data, 'state'))
+    session['feed_room'] = room
     join_room(room)
-    # You can send a system message here, like "User joined the room"
-    emit('status', {'msg': 'A user has entered the room.'}, room=room)
 
 @socketio.on('message')
 def on_message(data):
-    sender = data.get('sender_id')
-    room = data.get('room')
-    msg = data.get('msg')
-    
-    # You would typically save this message to the database here
+    data = _payload(data)
+    conversation, vendor_id = _conversation_for_current_vendor(data)
+    msg = (_str_field(data, 'msg') or '').strip()
+    if not conversation or not msg:
+        return
+
+    message = record_message(conversation, vendor_id, msg)
 
     # Send the message to everyone in the room
-    emit('message', {'sender': sender, 'msg': msg}, room=room)
\ No newline at end of file
+    emit('message', {
+        'id': message.id,
+        'sender_id': vendor_id,
+        'sender': message.sender.business_name,
+        'msg': msg,
+    }, room=conversation.room)
+
+@socketio.on('read')
+def on_read(data):
+    data = _payload(data)
+    conversation, vendor_id = _conversation_for_current_vendor(data)
+    message_id = _int_field(data, 'message_id')
+    if not conversation or not message_id:
+        return
+    queue_read_receipt(conversation, vendor_id, message_id)
+
+# Imported last: both modules build their Coalescer from this one
+from app.feed import feed_room
+from app.chat import record_message, queue_read_receipt
@@ -0,0 +1,73 @@
+from flask import url_for
+from app import socketio
+from app.events import Coalescer
+from app.queries import fresh_since
+from app.storage import media_url
+
+def feed_room(zone=None, state=None):
+    """Room a visitor subscribes to: their zone, else their state, else everything."""
+    if zone:
+        return f'feed:zone:{zone.strip().lower()}'
+    if state:
+        return f'feed:state:{state.strip().lower()}'
+    return 'feed:all'
+
+def feed_rooms(zone, state):
+    """Every room a snack from this zone/state is published to."""
+    return [feed_room(zone=zone), feed_room(state=state), feed_room()]
+
+def snack_card(snack):
+    """Compact JSON payload with just what the home page card shows."""
+    vendor = snack.vendor
+    return {
+        'id': snack.id,
+        'name': snack.name,
+        'description': snack.description,
+        'price': round(snack.price, 2),
+        'media_url': media_url(snack.media_url) or None,
+        'media_type': snack.media_type,
+        'poster_url': media_url(snack.poster_url) or None,
+        'vendor_name': vendor.business_name,
+        'vendor_url': url_for('main.vendor_profile', vendor_id=vendor.id),
+        'whatsapp': vendor.whatsapp_number,
+    }
+
+def prepare_snack_event(action, snack):
+    """Work out a feed update ('upsert' or 'delete') for the snack's zone/state
+    rooms and return a callable that queues it.
+
+    For deletes, call this before the row is deleted (the vendor is needed to
+    pick the rooms) and the returned callable only once the commit succeeds, so
+    a failed delete doesn't remove the card from open home pages. An upsert for
+    a snack past the feed window is sent as a delete, so editing an old snack
+    doesn't put it back at the top of live feeds.
+    """
+    if action == 'delete' or snack.date_posted < fresh_since():
+        event = {'action': 'delete', 'id': snack.id}
+    else:
+        event = {'action': 'upsert', 'snack': snack_card(snack)}
+    keys = [(room, snack.id) for room in feed_rooms(snack.vendor.location_zone, snack.vendor.state)]
+
+    def publish():
+        for key in keys:
+            # Later events for the same snack replace earlier ones in the burst.
+            _events.add(key, event)
+    return publish
+
+def publish_snack_event(action, snack):
+    """Queue a feed update for a snack whose change is already committed.
+
+    Nothing is sent until the coalescing window ends.
+    """
+    prepare_snack_event(action, snack)()
+
+def _flush(events):
+    batches = {}
+    for (room, _), event in events.items():
+        batches.setdefault(room, []).append(event)
+    for room, batch in batches.items():
+        socketio.emit('feed', {'events': batch}, to=room)
+
+# Snack events are buffered per room and flushed together, so a vendor posting
+# several snacks in a row (or editing one repeatedly) costs one push per room.
+_events = Coalescer(_flush, 'FEED_COALESCE_SECONDS')
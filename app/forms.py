@@ -1,9 +1,10 @@
 # northern-market-hub/app/forms.py
 from flask_wtf import FlaskForm
 from flask_wtf.file import FileField, FileAllowed
-from wtforms import StringField, PasswordField, SubmitField, TextAreaField, FloatField, BooleanField, IntegerField
+from wtforms import StringField, PasswordField, SubmitField, TextAreaField, FloatField, BooleanField, IntegerField, HiddenField
 from wtforms.validators import DataRequired, Length, Email, EqualTo, ValidationError, NumberRange
-from app.models import Vendor, Review
+from app.models import Review
+from app.availability import UNIQUE_FIELDS, TAKEN_MESSAGES, check_registration
 import re
 
 class RegistrationForm(FlaskForm):
@@ -16,6 +17,8 @@ class RegistrationForm(FlaskForm):
     password = PasswordField('Password', validators=[DataRequired()])
     confirm_password = PasswordField('Confirm Password', validators=[DataRequired(), EqualTo('password', message='Passwords must match')])
     logo_file = FileField('Business Logo (PNG, JPG)', validators=[FileAllowed(['jpg', 'png', 'jpeg'], 'Images only!')])
+    # Set by the browser after a direct-to-storage upload (see static/js/direct_upload.js)
+    logo_token = HiddenField()
     referral_code = StringField('Referral Code (Optional)', validators=[Length(max=10)])
     submit = SubmitField('Register')
     
@@ -23,15 +26,14 @@ class RegistrationForm(FlaskForm):
         if not re.match(r'^\d{10,20}$', whatsapp_number.data):
             raise ValidationError('Invalid WhatsApp number format. Please include country code, e.g., 23480...')
 
-    def validate_email(self, email):
-        user = Vendor.query.filter_by(email=email.data).first()
-        if user:
-            raise ValidationError('That email is already registered. Please choose a different one.')
-        
-    def validate_business_name(self, business_name):
-        vendor = Vendor.query.filter_by(business_name=business_name.data).first()
-        if vendor:
-            raise ValidationError('That business name is already taken. Please choose a different one.')
+    def validate(self, extra_validators=None):
+        valid = super().validate(extra_validators)
+        # Uniqueness of every field, and the referrer, in one lookup (see app/availability.py)
+        values = {field: self[field].data for field in UNIQUE_FIELDS if not self[field].errors}
+        taken, self.referrer_id = check_registration(referral_code=self.referral_code.data, **values)
+        for field in taken:
+            self[field].errors.append(TAKEN_MESSAGES[field])
+        return valid and not taken
 
 class LoginForm(FlaskForm):
     email = StringField('Email', validators=[DataRequired(), Email()])
@@ -44,6 +46,7 @@ class AddSnackForm(FlaskForm):
     description = TextAreaField('Description', validators=[DataRequired()])
     price = FloatField('Price (₦)', validators=[DataRequired(), NumberRange(min=0.01)])
     media_file = FileField('Snack Media (Image/Video)', validators=[FileAllowed(['jpg', 'png', 'jpeg', 'mp4', 'mov'], 'Images or Videos only!')])
+    media_token = HiddenField()
     submit = SubmitField('Add Snack')
 
 class SearchForm(FlaskForm):
@@ -75,6 +78,7 @@ class UpdateProfileForm(FlaskForm):
     location_zone = StringField('Location Zone', validators=[DataRequired(), Length(min=2, max=100)])
     state = StringField('State', validators=[DataRequired(), Length(min=2, max=100)])
     logo_file = FileField('Update Logo', validators=[FileAllowed(['jpg', 'png', 'jpeg'], 'Images only!')])
+    logo_token = HiddenField()
     submit = SubmitField('Update Profile')
 
 class ReviewForm(FlaskForm):
@@ -87,6 +91,7 @@ class AdForm(FlaskForm):
     content = TextAreaField('Ad Content', validators=[DataRequired()])
     link_url = StringField('Link URL', validators=[DataRequired()])
     media_file = FileField('Ad Media (Image/Video)', validators=[FileAllowed(['jpg', 'png', 'jpeg', 'mp4', 'mov'], 'Images or Videos only!')])
+    media_token = HiddenField()
     is_active = BooleanField('Is Active?')
     submit = SubmitField('Submit Ad')
 
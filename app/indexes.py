@@ -0,0 +1,128 @@
+import heapq
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from flask import current_app
+from app import db
+from app.changes import on_commit
+
+_index_classes = []
+
+class LiveIndex:
+    """Base for the in-memory indexes: typeahead, zone feeds, ranking, taken values.
+
+    Each worker process builds its own copy from the database on first use and
+    keeps it current from the commit hooks in app/changes.py. Those only report
+    this worker's own writes, so the whole index is rebuilt from the database
+    once it is older than the `rebuild_setting` config value, which is how
+    each worker picks up the others' writes.
+
+    Subclasses name their app.extensions key and rebuild setting, and
+    implement statements() (the selects the index is loaded from; async
+    callers run them themselves and pass the rows to load()), _reset(),
+    _load(*rows) and _apply(changes). The lock is held around _load and _apply.
+
+    Indexes of fresh snacks schedule each one with _expire_at() and call
+    _expire() before reading; they implement _expires_at(snack_id) and
+    _remove_snack(snack_id).
+
+    Commits that land while a rebuild is querying are missing from its rows, so
+    they are queued and replayed onto the new copy once it is loaded; _apply
+    only sees upserts and deletes by id, so replaying one already in the rows
+    is harmless.
+    """
+
+    extension = None
+    rebuild_setting = None
+    rebuild_default = 60
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        _index_classes.append(cls)
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._queues = []
+        self._expiry = []
+        self._reset()
+        self.built_at = 0
+
+    def stale(self):
+        return time.time() - self.built_at > current_app.config.get(self.rebuild_setting, self.rebuild_default)
+
+    def statements(self):
+        raise NotImplementedError
+
+    def _expires_at(self, snack_id):
+        """When the listed snack stops being fresh, or None if it isn't listed."""
+        raise NotImplementedError
+
+    def _expire_at(self, snack_id, expires_at):
+        heapq.heappush(self._expiry, (expires_at, snack_id))
+
+    def _expire(self):
+        now = datetime.utcnow()
+        while self._expiry and self._expiry[0][0] <= now:
+            expires_at, snack_id = heapq.heappop(self._expiry)
+            # Stale heap entry if the snack was re-posted or deleted since
+            if self._expires_at(snack_id) == expires_at:
+                self._remove_snack(snack_id)
+
+    @contextmanager
+    def capture_changes(self):
+        """Collect the changes applied inside the block, to replay after a load()."""
+        queued = []
+        with self._lock:
+            self._queues.append(queued)
+        try:
+            yield queued
+        finally:
+            with self._lock:
+                self._queues.remove(queued)
+
+    def load(self, *rows, queued=()):
+        with self._lock:
+            self._expiry = []
+            self._reset()
+            self._load(*rows)
+            self._replay(queued)
+
+    def _replay(self, queued):
+        # Called with the lock held, once the new copy is in place
+        for changes in queued:
+            self._apply(changes)
+        self.built_at = time.time()
+
+    def rebuild(self):
+        with self.capture_changes() as queued:
+            self.load(*(db.session.execute(stmt).all() for stmt in self.statements()), queued=queued)
+
+    def apply(self, changes):
+        with self._lock:
+            for queued in self._queues:
+                queued.append(changes)
+            if self.built_at:
+                self._apply(changes)
+
+    @classmethod
+    def get(cls, app=None, rebuild=True):
+        """This app's index, rebuilt from the database when stale.
+
+        Async callers pass rebuild=False and, when stale(), run statements()
+        and load() the rows inside capture_changes().
+        """
+        app = app or current_app._get_current_object()
+        index = app.extensions.get(cls.extension)
+        if index is None:
+            index = app.extensions[cls.extension] = cls()
+        if rebuild and index.stale():
+            index.rebuild()
+        return index
+
+@on_commit
+def _apply_changes(changes):
+    for cls in _index_classes:
+        index = current_app.extensions.get(cls.extension)
+        if index is not None:
+            index.apply(changes)
@@ -0,0 +1,66 @@
+import os
+import shutil
+import mimetypes
+import subprocess
+from flask import current_app, send_from_directory, abort, make_response, redirect
+from app.storage import get_storage, LocalStorage, UPLOAD_FOLDERS
+
+def generate_poster(key):
+    """Grab a frame from an uploaded video as a JPEG poster; return its media key.
+
+    Needs ffmpeg on PATH and a local copy of the video, so it only runs with
+    local storage. Returns None otherwise or when extraction fails, in which
+    case the browser just shows the first frame once metadata loads.
+    """
+    ffmpeg = shutil.which(current_app.config.get('FFMPEG_BINARY', 'ffmpeg'))
+    storage = get_storage()
+    source = storage.local_path(key)
+    if not ffmpeg or not source or not os.path.isfile(source):
+        return None
+
+    poster_key = os.path.splitext(key)[0] + '.poster.jpg'
+    try:
+        subprocess.run(
+            [ffmpeg, '-y', '-loglevel', 'error', '-ss', '1', '-i', source,
+             '-frames:v', '1', '-vf', 'scale=640:-2', storage.local_path(poster_key)],
+            check=True, timeout=30,
+        )
+    except (subprocess.SubprocessError, OSError):
+        current_app.logger.warning('Could not generate poster for %s', key)
+        return None
+    return poster_key
+
+def send_media(filename):
+    """Serve an uploaded file with HTTP Range support, or hand it to the front server.
+
+    With MEDIA_ACCEL_REDIRECT_PREFIX set (e.g. '/protected-media/'), nginx gets an
+    X-Accel-Redirect and streams the bytes itself. Otherwise Werkzeug answers Range
+    requests from the file, and USE_X_SENDFILE makes it emit X-Sendfile instead.
+    Object-store backends serve Range requests themselves, so we just redirect.
+    """
+    if filename.split('/', 1)[0] not in UPLOAD_FOLDERS:
+        abort(404)
+    storage = get_storage()
+    if not isinstance(storage, LocalStorage):
+        return redirect(storage.url(filename))
+
+    try:
+        path = storage.local_path(filename)
+    except ValueError:
+        abort(404)
+    if not os.path.isfile(path):
+        abort(404)
+
+    max_age = current_app.config.get('MEDIA_MAX_AGE', 7 * 24 * 3600)
+    accel_prefix = current_app.config.get('MEDIA_ACCEL_REDIRECT_PREFIX')
+    if accel_prefix:
+        response = make_response('')
+        response.headers['X-Accel-Redirect'] = accel_prefix.rstrip('/') + '/' + filename
+        response.mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+        response.cache_control.public = True
+        response.cache_control.max_age = max_age
+        return response
+
+    response = send_from_directory(storage.root, filename, conditional=True, max_age=max_age)
+    response.accept_ranges = 'bytes'
+    return response
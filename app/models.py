@@ -17,7 +17,10 @@ class Vendor(db.Model, UserMixin):
     is_admin = db.Column(db.Boolean, default=False)
     is_verified = db.Column(db.Boolean, default=False)
     referral_code = db.Column(db.String(10), unique=True, nullable=False)
-    referred_by = db.Column(db.Integer, db.ForeignKey('vendor.id'))
+    referred_by = db.Column(db.Integer, db.ForeignKey('vendor.id'), index=True)
+    # Maintained incrementally by app.referrals when vendors register or are deleted
+    referral_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    downline_count = db.Column(db.Integer, nullable=False, default=0, server_default='0', index=True)
     
     snacks = db.relationship('Snack', backref='vendor', lazy=True, cascade="all, delete-orphan")
     referrals = db.relationship('Vendor', backref=db.backref('referrer', remote_side=[id]), lazy=True)
@@ -68,7 +71,8 @@ class Snack(db.Model):
     price = db.Column(db.Float, nullable=False)
     media_url = db.Column(db.String(200), nullable=False)
     media_type = db.Column(db.String(10), nullable=False)
-    date_posted = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    poster_url = db.Column(db.String(200), nullable=True)
+    date_posted = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, index=True)
     vendor_id = db.Column(db.Integer, db.ForeignKey('vendor.id'), nullable=False)
     reviews = db.relationship('Review', backref='snack', lazy=True, cascade="all, delete-orphan")
 
@@ -91,9 +95,112 @@ class Ad(db.Model):
     content = db.Column(db.Text, nullable=False)
     media_url = db.Column(db.String(255), nullable=True)
     media_type = db.Column(db.String(10), nullable=True)
+    poster_url = db.Column(db.String(255), nullable=True)
     link_url = db.Column(db.String(255), nullable=True)
     date_posted = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
     is_active = db.Column(db.Boolean, nullable=False, default=True)
 
     def __repr__(self):
-        return f"Ad('{self.title}', '{self.date_posted}')"
\ No newline at end of file
+        return f"Ad('{self.title}', '{self.date_posted}')"
+
+class Conversation(db.Model):
+    """One chat thread between two vendors.
+
+    The pair is stored lowest id first (vendor_a_id < vendor_b_id), so both
+    orientations land on the one unique row.
+    """
+    __table_args__ = (
+        db.UniqueConstraint('vendor_a_id', 'vendor_b_id'),
+        db.CheckConstraint('vendor_a_id < vendor_b_id', name='ck_conversation_ordered_pair'),
+        db.Index('ix_conversation_vendor_a_last', 'vendor_a_id', 'last_message_at'),
+        db.Index('ix_conversation_vendor_b_last', 'vendor_b_id', 'last_message_at'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    vendor_a_id = db.Column(db.Integer, db.ForeignKey('vendor.id'), nullable=False)
+    vendor_b_id = db.Column(db.Integer, db.ForeignKey('vendor.id'), nullable=False)
+    last_message = db.Column(db.String(200), nullable=True)
+    last_message_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    last_sender_id = db.Column(db.Integer, nullable=True)
+    vendor_a_unread = db.Column(db.Integer, nullable=False, default=0)
+    vendor_b_unread = db.Column(db.Integer, nullable=False, default=0)
+    vendor_a_last_read_id = db.Column(db.Integer, nullable=False, default=0)
+    vendor_b_last_read_id = db.Column(db.Integer, nullable=False, default=0)
+
+    vendor_a = db.relationship('Vendor', foreign_keys=[vendor_a_id])
+    vendor_b = db.relationship('Vendor', foreign_keys=[vendor_b_id])
+    messages = db.relationship('ChatMessage', backref='conversation', lazy=True, cascade="all, delete-orphan")
+
+    @property
+    def room(self):
+        return f'conversation:{self.id}'
+
+    def other_party(self, vendor_id):
+        return self.vendor_b if vendor_id == self.vendor_a_id else self.vendor_a
+
+    def unread_for(self, vendor_id):
+        return self.vendor_a_unread if vendor_id == self.vendor_a_id else self.vendor_b_unread
+
+    def __repr__(self):
+        return f"Conversation('{self.vendor_a_id}', '{self.vendor_b_id}')"
+
+class ChatMessage(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    conversation_id = db.Column(db.Integer, db.ForeignKey('conversation.id'), nullable=False, index=True)
+    sender_id = db.Column(db.Integer, db.ForeignKey('vendor.id'), nullable=False)
+    body = db.Column(db.Text, nullable=False)
+    date_posted = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    sender = db.relationship('Vendor')
+
+    def __repr__(self):
+        return f"ChatMessage('{self.sender_id}', '{self.date_posted}')"
+
+class ReplicaHeartbeat(db.Model):
+    """Single row touched on the primary; its age on a replica is the replication lag."""
+    id = db.Column(db.Integer, primary_key=True)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+# Cold storage for snacks past the 24h window, moved out by app/archive.py so
+# the live snack/review tables (and their indexes) only hold the hot rows.
+class ArchivedSnack(db.Model):
+    # Own ids: live ids can be reused once their rows are deleted
+    id = db.Column(db.Integer, primary_key=True)
+    source_id = db.Column(db.Integer, nullable=False, index=True)
+    name = db.Column(db.String(100), nullable=False)
+    description = db.Column(db.Text, nullable=False)
+    price = db.Column(db.Float, nullable=False)
+    media_url = db.Column(db.String(200), nullable=False)
+    media_type = db.Column(db.String(10), nullable=False)
+    poster_url = db.Column(db.String(200), nullable=True)
+    date_posted = db.Column(db.DateTime, nullable=False)
+    vendor_id = db.Column(db.Integer, db.ForeignKey('vendor.id'), nullable=False, index=True)
+    archived_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f"ArchivedSnack('{self.name}', '{self.date_posted}')"
+
+class ArchivedReview(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    source_id = db.Column(db.Integer, nullable=False)
+    snack_id = db.Column(db.Integer, db.ForeignKey('archived_snack.id'), nullable=False, index=True)
+    rating = db.Column(db.Integer, nullable=False)
+    comment = db.Column(db.Text, nullable=False)
+    date_posted = db.Column(db.DateTime, nullable=False)
+
+    def __repr__(self):
+        return f"ArchivedReview('{self.rating}', '{self.date_posted}')"
+
+class VendorRatingRollup(db.Model):
+    """Per-vendor totals over archived snacks, so all-time ratings never scan the archive."""
+    vendor_id = db.Column(db.Integer, db.ForeignKey('vendor.id'), primary_key=True)
+    snack_count = db.Column(db.Integer, nullable=False, default=0)
+    review_count = db.Column(db.Integer, nullable=False, default=0)
+    rating_total = db.Column(db.Integer, nullable=False, default=0)
+
+class VendorDownlineDepth(db.Model):
+    """How many vendors sit at each referral depth below a vendor, kept by app.referrals
+    for the first DOWNLINE_DEPTHS levels so the dashboard never walks the tree."""
+    vendor_id = db.Column(db.Integer, db.ForeignKey('vendor.id'), primary_key=True)
+    depth = db.Column(db.Integer, primary_key=True)
+    count = db.Column(db.Integer, nullable=False, default=0)
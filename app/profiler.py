@@ -0,0 +1,280 @@
+import _thread
+import json
+import os
+import random
+import sys
+import time
+from collections import Counter
+from datetime import datetime
+from flask import current_app, g, has_app_context, request, session
+from itsdangerous import URLSafeTimedSerializer, BadSignature
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+try:
+    from gevent import monkey
+except ImportError:  # Only needed under the gevent worker
+    monkey = None
+
+try:
+    from greenlet import getcurrent as current_greenlet
+except ImportError:
+    current_greenlet = None
+
+# The sampler must be a real OS thread sleeping with the real time.sleep, even
+# when gevent has patched both, or it would only run when the request yields.
+if monkey is not None:
+    _start_thread, _get_ident, _allocate_lock = monkey.get_original(
+        '_thread', ['start_new_thread', 'get_ident', 'allocate_lock'])
+    _sleep = monkey.get_original('time', 'sleep')
+else:
+    _start_thread, _get_ident, _allocate_lock = _thread.start_new_thread, _thread.get_ident, _thread.allocate_lock
+    _sleep = time.sleep
+
+PROFILE_HEADER = 'X-Profile-Token'
+PROFILE_PARAM = '_profile'
+MAX_STACK_DEPTH = 100
+MAX_SQL_STATEMENTS = 500
+
+_short_paths = {}
+
+def _short_path(filename):
+    if filename not in _short_paths:
+        short = filename
+        for prefix in sorted(filter(None, sys.path), key=len, reverse=True):
+            if filename.startswith(prefix + os.sep):
+                short = filename[len(prefix) + 1:]
+                break
+        _short_paths[filename] = short
+    return _short_paths[filename]
+
+def _frame_label(frame):
+    code = frame.f_code
+    return f'{code.co_name} ({_short_path(code.co_filename)}:{code.co_firstlineno})'.replace(';', ':')
+
+class StackSampler:
+    """Samples one request's Python stack every `interval` seconds from a background thread.
+
+    Under gevent the request runs in a greenlet that shares its thread with
+    other requests: while it is running we read the thread's frame, and while
+    it is switched out (waiting on the database, say) we read the greenlet's
+    own suspended frame, so samples are never attributed to another request.
+    """
+
+    def __init__(self, interval, max_seconds):
+        self.interval = interval
+        self.deadline = time.perf_counter() + max_seconds
+        self.thread_id = _get_ident()
+        self.greenlet = current_greenlet() if current_greenlet else None
+        self.stacks = Counter()
+        self.samples = 0
+        self._running = True
+        self._lock = _allocate_lock()
+
+    def start(self):
+        _start_thread(self._run, ())
+
+    def stop(self):
+        self._running = False
+        with self._lock:  # wait out a sample in progress
+            pass
+
+    def _run(self):
+        while self._running and time.perf_counter() < self.deadline:
+            _sleep(self.interval)
+            with self._lock:
+                if self._running:
+                    self._sample()
+
+    def _sample(self):
+        frame = self.greenlet.gr_frame if self.greenlet is not None else None
+        state = 'waiting' if frame is not None else 'running'
+        if frame is None:
+            frame = sys._current_frames().get(self.thread_id)
+        if frame is None:
+            return
+        stack = []
+        while frame is not None and len(stack) < MAX_STACK_DEPTH:
+            stack.append(_frame_label(frame))
+            frame = frame.f_back
+        stack.append(f'[{state}]')
+        self.stacks[';'.join(reversed(stack))] += 1
+        self.samples += 1
+
+class Profile:
+    def __init__(self, trigger, config):
+        self.trigger = trigger
+        self.started_at = datetime.utcnow()
+        self.id = f'{self.started_at:%Y%m%d-%H%M%S}-{os.getpid()}-{random.randrange(16 ** 6):06x}'
+        self.start = time.perf_counter()
+        self.method = request.method
+        self.path = request.full_path.rstrip('?')
+        self.endpoint = request.endpoint
+        self.sql = []
+        self.status = None
+        self.directory = config['PROFILER_DIR']
+        self.keep = config.get('PROFILER_KEEP', 100)
+        self.sampler = StackSampler(config.get('PROFILER_INTERVAL', 0.005), config.get('PROFILER_MAX_SECONDS', 30))
+        self.sampler.start()
+        self.attached = False
+        self.finished = False
+
+    def record_sql(self, statement, started, duration):
+        if len(self.sql) < MAX_SQL_STATEMENTS:
+            self.sql.append({
+                'start_ms': round((started - self.start) * 1000, 2),
+                'duration_ms': round(duration * 1000, 2),
+                'statement': ' '.join(statement.split())[:1000],
+            })
+
+    def finish(self):
+        # Runs when the response is closed, i.e. after streamed bodies are fully sent
+        if self.finished:
+            return
+        self.finished = True
+        self.sampler.stop()
+        duration = time.perf_counter() - self.start
+        data = {
+            'id': self.id,
+            'started_at': self.started_at.isoformat(),
+            'trigger': self.trigger,
+            'method': self.method,
+            'path': self.path,
+            'endpoint': self.endpoint,
+            'status': self.status,
+            'duration_ms': round(duration * 1000, 2),
+            'samples': self.sampler.samples,
+            'interval_ms': self.sampler.interval * 1000,
+            'sql': self.sql,
+            'sql_ms': round(sum(query['duration_ms'] for query in self.sql), 2),
+            'stacks': dict(self.sampler.stacks),
+        }
+        os.makedirs(self.directory, exist_ok=True)
+        with open(os.path.join(self.directory, self.id + '.json'), 'w') as f:
+            json.dump(data, f)
+        _prune(self.directory, self.keep)
+
+def _prune(directory, keep):
+    names = sorted(name for name in os.listdir(directory) if name.endswith('.json'))
+    for name in names[:-keep] if keep else []:
+        try:
+            os.remove(os.path.join(directory, name))
+        except OSError:
+            pass
+
+def _signer():
+    return URLSafeTimedSerializer(current_app.config['SECRET_KEY'], salt='request-profiler')
+
+def profile_token(vendor_id):
+    """Value for the X-Profile-Token header, for profiling from curl or a load tester."""
+    return _signer().dumps(vendor_id)
+
+def _admin_requested():
+    # Same check as admin_only: a signed token, or ?_profile=1 from an admin's session
+    from app import db
+    from app.models import Vendor
+    token = request.headers.get(PROFILE_HEADER)
+    if token:
+        try:
+            vendor_id = _signer().loads(token, max_age=current_app.config.get('PROFILER_TOKEN_MAX_AGE', 86400))
+        except BadSignature:
+            return False
+    elif request.args.get(PROFILE_PARAM) and session.get('vendor_id'):
+        vendor_id = session['vendor_id']
+    else:
+        return False
+    vendor = db.session.get(Vendor, vendor_id)
+    return bool(vendor and vendor.is_admin)
+
+def list_profiles(directory):
+    profiles = []
+    if not os.path.isdir(directory):
+        return profiles
+    for name in sorted(os.listdir(directory), reverse=True):
+        if name.endswith('.json'):
+            with open(os.path.join(directory, name)) as f:
+                data = json.load(f)
+            data.pop('stacks', None)
+            profiles.append(data)
+    return profiles
+
+def load_profile(directory, profile_id):
+    path = os.path.join(directory, os.path.basename(profile_id) + '.json')
+    if not os.path.isfile(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+def collapsed_stacks(profile):
+    """Brendan Gregg's collapsed format: feed to flamegraph.pl, speedscope or inferno."""
+    return ''.join(f'{stack} {count}\n' for stack, count in sorted(profile['stacks'].items()))
+
+def hot_frames(profile, limit=25):
+    """(frame, samples at the top of the stack, samples anywhere in the stack) for the busiest frames."""
+    own, total = Counter(), Counter()
+    for stack, count in profile['stacks'].items():
+        frames = stack.split(';')
+        own[frames[-1]] += count
+        for frame in set(frames):
+            total[frame] += count
+    return [(frame, own[frame], count) for frame, count in total.most_common() if not frame.startswith('[')][:limit]
+
+class RequestProfiler:
+    """Stack-sampling profiler and SQL timeline for individual requests.
+
+    A request is profiled when an admin asks for it (?_profile=1 with an admin
+    session, or an X-Profile-Token header from /admin/profiles), or at random
+    for PROFILER_SAMPLE_RATE of requests. Profiles are written as JSON to
+    PROFILER_DIR, where every worker's profiles show up on /admin/profiles.
+    """
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        if not app.config.get('PROFILER_DIR'):
+            app.config['PROFILER_DIR'] = os.path.join(app.instance_path, 'profiles')
+        app.before_request(self._start)
+        app.after_request(self._attach)
+        app.teardown_request(self._teardown)
+
+    def _start(self):
+        if request.endpoint == 'static' or request.endpoint is None or g.get('async_view'):
+            # Async views share the event loop thread, which can't be sampled per request
+            return
+        config = current_app.config
+        rate = config.get('PROFILER_SAMPLE_RATE', 0)
+        if _admin_requested():
+            trigger = 'admin'
+        elif rate and random.random() < rate:
+            trigger = 'sampled'
+        else:
+            return
+        g.profile = Profile(trigger, config)
+
+    def _attach(self, response):
+        profile = g.get('profile')
+        if profile is not None:
+            profile.status = response.status_code
+            response.headers['X-Profile-Id'] = profile.id
+            response.call_on_close(profile.finish)
+            profile.attached = True
+        return response
+
+    def _teardown(self, exc):
+        profile = g.get('profile')
+        if profile is not None and not profile.attached:
+            profile.status = 500
+            profile.finish()
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info['profiler_started'] = time.perf_counter()
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info.pop('profiler_started', None)
+    profile = g.get('profile') if has_app_context() else None
+    if started is not None and profile is not None and not profile.finished:
+        profile.record_sql(statement, started, time.perf_counter() - started)
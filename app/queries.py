@@ -0,0 +1,73 @@
+from datetime import datetime, timedelta
+from sqlalchemy import select, func
+from sqlalchemy.orm import selectinload, configure_mappers
+from app.models import Vendor, Snack, Review, Ad, VendorRatingRollup
+
+# Snack.vendor is a backref, which only exists once the mappers are configured
+configure_mappers()
+
+# Statements for the public read pages. They are shared by the Flask routes
+# (db.session) and the async views in app/asgi.py (AsyncSession), so anything
+# a template touches must be eager-loaded here.
+
+# Snacks are only listed for a day after they are posted
+FRESH_FOR = timedelta(days=1)
+
+def fresh_since():
+    return datetime.utcnow() - FRESH_FOR
+
+def snacks_by_ids(snack_ids):
+    return select(Snack).options(selectinload(Snack.vendor)).where(Snack.id.in_(snack_ids))
+
+def in_id_order(rows, snack_ids):
+    """Rows from snacks_by_ids() in the order of snack_ids (rows deleted since are skipped)."""
+    by_id = {row.id: row for row in rows}
+    return [by_id[snack_id] for snack_id in snack_ids if snack_id in by_id]
+
+def all_vendors():
+    return select(Vendor).order_by(Vendor.business_name)
+
+def active_ads():
+    return select(Ad).where(Ad.is_active == True)
+
+def search_snacks(location_zone=None, snack_type=None, snack_ids=None):
+    """Fresh snacks, optionally narrowed to snack_ids (a zone feed) instead of a zone match."""
+    if snack_ids is not None:
+        stmt = snacks_by_ids(snack_ids).where(Snack.date_posted > fresh_since())
+        location_zone = None
+    else:
+        stmt = select(Snack).join(Vendor).options(selectinload(Snack.vendor)) \
+            .where(Snack.date_posted > fresh_since())
+    if location_zone:
+        stmt = stmt.where(Vendor.location_zone.ilike(f'%{location_zone}%'))
+    if snack_type:
+        stmt = stmt.where(Snack.name.ilike(f'%{snack_type}%'))
+    return stmt.order_by(Snack.date_posted.desc())
+
+def search_vendors(business_name=None, location_zone=None):
+    stmt = select(Vendor)
+    if business_name:
+        stmt = stmt.where(Vendor.business_name.ilike(f'%{business_name}%'))
+    if location_zone:
+        stmt = stmt.where(Vendor.location_zone.ilike(f'%{location_zone}%'))
+    return stmt.order_by(Vendor.business_name)
+
+def vendor_snacks_with_rating(vendor_id):
+    return select(Snack, func.avg(Review.rating).label('average_rating')) \
+        .outerjoin(Review) \
+        .where(Snack.vendor_id == vendor_id) \
+        .where(Snack.date_posted > fresh_since()) \
+        .group_by(Snack.id) \
+        .order_by(Snack.date_posted.desc())
+
+def vendor_rating_totals(vendor_id):
+    """One row of all-time (snack_count, review_count, rating_total): live rows plus the archive rollup."""
+    def rollup(column):
+        return func.coalesce(select(column).where(VendorRatingRollup.vendor_id == vendor_id).scalar_subquery(), 0)
+    live_snacks = select(func.count(Snack.id)).where(Snack.vendor_id == vendor_id).scalar_subquery()
+    live_reviews = select(func.count(Review.id)).join(Snack).where(Snack.vendor_id == vendor_id).scalar_subquery()
+    live_total = select(func.coalesce(func.sum(Review.rating), 0)).join(Snack) \
+        .where(Snack.vendor_id == vendor_id).scalar_subquery()
+    return select((live_snacks + rollup(VendorRatingRollup.snack_count)).label('snack_count'),
+                  (live_reviews + rollup(VendorRatingRollup.review_count)).label('review_count'),
+                  (live_total + rollup(VendorRatingRollup.rating_total)).label('rating_total'))
@@ -0,0 +1,180 @@
+import math
+from bisect import bisect_left, insort
+from datetime import datetime, timedelta
+from sqlalchemy import select
+from app.indexes import LiveIndex
+from app.models import Vendor, Snack, Review
+from app.queries import FRESH_FOR, fresh_since
+
+# Ratings are shrunk towards PRIOR_RATING as if every snack started with
+# PRIOR_WEIGHT reviews of that rating, so one 5-star review doesn't top the chart.
+PRIOR_RATING = 3.0
+PRIOR_WEIGHT = 2
+# Trending interest halves every TRENDING_HALF_LIFE
+TRENDING_HALF_LIFE = timedelta(hours=6)
+RATING_WEIGHT = 0.5
+# Verified vendors get VERIFIED_BONUS on the (log) trending score and
+# VERIFIED_RATING_BONUS stars on the rating score
+VERIFIED_BONUS = 0.3
+VERIFIED_RATING_BONUS = 0.1
+_EPOCH = datetime(2024, 1, 1)
+
+def rating_score(count, total, verified):
+    """Bayesian average rating, with a small boost for verified vendors."""
+    return (PRIOR_RATING * PRIOR_WEIGHT + total) / (PRIOR_WEIGHT + count) + (VERIFIED_RATING_BONUS if verified else 0)
+
+def trending_score(date_posted, count, total, verified):
+    """log of (review volume x rating x verification) interest decayed from date_posted.
+
+    Decay is exponential, so weight * 2^-(age / half-life) is kept as
+    log(weight) + posted / half-life: a snack's score never changes with the
+    clock and the sorted order stays valid without rescoring.
+    """
+    age_units = (date_posted - _EPOCH) / TRENDING_HALF_LIFE
+    return (age_units * math.log(2)
+            + math.log1p(count)
+            + RATING_WEIGHT * (rating_score(count, total, False) - PRIOR_RATING)
+            + (VERIFIED_BONUS if verified else 0))
+
+def ranking_rows_statements():
+    """(snacks, reviews, vendors) statements a SnackRanking is loaded from; run sync or async."""
+    fresh = Snack.date_posted > fresh_since()
+    return (select(Snack.id, Snack.date_posted, Snack.vendor_id).where(fresh),
+            select(Review.id, Review.snack_id, Review.rating).join(Snack).where(fresh),
+            select(Vendor.id, Vendor.is_verified))
+
+class SnackRanking(LiveIndex):
+    """Fresh snacks kept sorted by trending score and by rating.
+
+    Reviews adjust one snack's running count/total and move it within the two
+    sorted lists, instead of re-aggregating the reviews table.
+    """
+
+    extension = 'snack_ranking'
+    rebuild_setting = 'RANKING_REBUILD_SECONDS'
+
+    def _reset(self):
+        self._snacks = {}     # snack_id -> [date_posted, vendor_id, review_count, rating_total]
+        self._reviews = {}    # review_id -> (snack_id, rating), for fresh snacks
+        self._verified = {}   # vendor_id -> is_verified
+        self._trending = []   # sorted [(-trending_score, snack_id)]
+        self._top_rated = []  # sorted [(-rating_score, -review_count, snack_id)], reviewed snacks only
+        self._keys = {}       # snack_id -> (trending key, top rated key or None)
+
+    def statements(self):
+        return ranking_rows_statements()
+
+    def _load(self, snack_rows, review_rows, vendor_rows):
+        self._verified = {vendor_id: bool(verified) for vendor_id, verified in vendor_rows}
+        for snack_id, date_posted, vendor_id in snack_rows:
+            self._snacks[snack_id] = [date_posted, vendor_id, 0, 0]
+            self._expire_at(snack_id, date_posted + FRESH_FOR)
+        for review_id, snack_id, rating in review_rows:
+            snack = self._snacks.get(snack_id)
+            if snack is None:
+                # Snack committed after the snack query; a replayed change or
+                # the next rebuild picks both up.
+                continue
+            self._reviews[review_id] = (snack_id, rating)
+            snack[2] += 1
+            snack[3] += rating
+        for snack_id in self._snacks:
+            self._rescore(snack_id)
+
+    def _unlist(self, snack_id):
+        trending_key, top_key = self._keys.pop(snack_id, (None, None))
+        if trending_key:
+            del self._trending[bisect_left(self._trending, trending_key)]
+        if top_key:
+            del self._top_rated[bisect_left(self._top_rated, top_key)]
+
+    def _rescore(self, snack_id):
+        self._unlist(snack_id)
+        date_posted, vendor_id, count, total = self._snacks[snack_id]
+        verified = self._verified.get(vendor_id, False)
+        trending_key = (-trending_score(date_posted, count, total, verified), snack_id)
+        top_key = (-rating_score(count, total, verified), -count, snack_id) if count else None
+        insort(self._trending, trending_key)
+        if top_key:
+            insort(self._top_rated, top_key)
+        self._keys[snack_id] = (trending_key, top_key)
+
+    def _remove_snack(self, snack_id):
+        self._unlist(snack_id)
+        self._snacks.pop(snack_id, None)
+
+    def _expires_at(self, snack_id):
+        snack = self._snacks.get(snack_id)
+        return snack[0] + FRESH_FOR if snack else None
+
+    def _apply_review(self, review_id, action, snack_id, rating):
+        previous = self._reviews.pop(review_id, None)
+        if previous and previous[0] in self._snacks:
+            self._snacks[previous[0]][2] -= 1
+            self._snacks[previous[0]][3] -= previous[1]
+            self._rescore(previous[0])
+        if action == 'upsert' and snack_id in self._snacks:
+            self._reviews[review_id] = (snack_id, rating)
+            self._snacks[snack_id][2] += 1
+            self._snacks[snack_id][3] += rating
+            self._rescore(snack_id)
+
+    def _apply(self, changes):
+        for kind, action, row_id, values in changes:
+            if kind == 'vendor':
+                verified = bool(values and values['is_verified'])
+                if self._verified.get(row_id) != verified:
+                    self._verified[row_id] = verified
+                    for snack_id, snack in self._snacks.items():
+                        if snack[1] == row_id:
+                            self._rescore(snack_id)
+        # Snacks before reviews, so a first review lands on a listed snack
+        for kind, action, row_id, values in changes:
+            if kind != 'snack':
+                continue
+            if action == 'delete':
+                self._remove_snack(row_id)
+            elif row_id in self._snacks:
+                if self._snacks[row_id][0] != values['date_posted']:
+                    self._expire_at(row_id, values['date_posted'] + FRESH_FOR)
+                self._snacks[row_id][:2] = [values['date_posted'], values['vendor_id']]
+                self._rescore(row_id)
+            elif values['date_posted'] + FRESH_FOR > datetime.utcnow():
+                self._snacks[row_id] = [values['date_posted'], values['vendor_id'], 0, 0]
+                self._expire_at(row_id, values['date_posted'] + FRESH_FOR)
+                self._rescore(row_id)
+        for kind, action, row_id, values in changes:
+            if kind == 'review':
+                self._apply_review(row_id, action, values['snack_id'], values['rating'])
+
+    def _ranked(self, ranked, limit, within):
+        self._expire()
+        snack_ids = []
+        for key in ranked:
+            if within is None or key[-1] in within:
+                snack_ids.append(key[-1])
+                if len(snack_ids) >= limit:
+                    break
+        return snack_ids
+
+    def trending(self, limit=6, within=None):
+        """Ids of the top trending fresh snacks, optionally only those in the set `within`."""
+        with self._lock:
+            return self._ranked(self._trending, limit, within)
+
+    def top_rated(self, limit=6, within=None):
+        """Ids of the best rated fresh snacks with at least one review."""
+        with self._lock:
+            return self._ranked(self._top_rated, limit, within)
+
+    def stats(self, snack_ids):
+        """{snack_id: (average rating, review count)} for reviewed snacks among snack_ids."""
+        with self._lock:
+            stats = {}
+            for snack_id in snack_ids:
+                snack = self._snacks.get(snack_id)
+                if snack and snack[2]:
+                    stats[snack_id] = (snack[3] / snack[2], snack[2])
+            return stats
+
+get_ranking = SnackRanking.get
@@ -0,0 +1,206 @@
+import os
+import sqlite3
+import threading
+import time
+from flask import current_app, request, session, g
+from werkzeug.exceptions import TooManyRequests, ServiceUnavailable
+
+try:
+    import redis
+except ImportError:  # Only needed when RATELIMIT_STORAGE = 'redis'; see requirements-redis.txt
+    redis = None
+
+# Never shed: static files and media (long video streams would hold slots)
+SHED_EXEMPT_ENDPOINTS = ('static', 'main.media')
+
+class MemoryBuckets:
+    """Token buckets in this process's memory. Each worker limits on its own,
+    so the effective limit is per worker; use 'redis' to share one across them."""
+
+    def __init__(self):
+        self._buckets = {}  # key -> (tokens, updated, time it is full again)
+        self._lock = threading.Lock()
+        self._next_prune = 0
+
+    def take(self, key, rate, burst, cost=1):
+        """Take cost tokens; returns (allowed, seconds until enough tokens)."""
+        now = time.monotonic()
+        with self._lock:
+            if now >= self._next_prune:
+                self._prune(now)
+            tokens, updated, _ = self._buckets.get(key, (burst, now, now))
+            tokens = min(burst, tokens + (now - updated) * rate)
+            allowed = tokens >= cost
+            if allowed:
+                tokens -= cost
+            self._buckets[key] = (tokens, now, now + (burst - tokens) / rate)
+            return allowed, 0 if allowed else (cost - tokens) / rate
+
+    def _prune(self, now):
+        # A full bucket is the same as no bucket, so only clients that used
+        # their allowance recently take up memory.
+        self._buckets = {key: bucket for key, bucket in self._buckets.items() if bucket[2] > now}
+        self._next_prune = now + 60
+
+# Refill and take in one round trip, atomically, for every worker sharing the bucket
+_TAKE_SCRIPT = """
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+local rate, burst, now, cost = tonumber(ARGV[1]), tonumber(ARGV[2]), tonumber(ARGV[3]), tonumber(ARGV[4])
+local tokens = tonumber(bucket[1]) or burst
+local updated = tonumber(bucket[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - updated) * rate)
+local retry_after = 0
+if tokens >= cost then
+    tokens = tokens - cost
+else
+    retry_after = (cost - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'updated', tostring(now))
+redis.call('EXPIRE', KEYS[1], math.ceil(burst / rate) + 1)
+return tostring(retry_after)
+"""
+
+class RedisBuckets:
+    """Token buckets in Redis, shared by every worker and node."""
+
+    def __init__(self, url, prefix='ratelimit:'):
+        if redis is None:
+            raise RuntimeError("RATELIMIT_STORAGE='redis' requires the redis package (requirements-redis.txt).")
+        self.client = redis.Redis.from_url(url)
+        self.prefix = prefix
+        self._take = self.client.register_script(_TAKE_SCRIPT)
+
+    def take(self, key, rate, burst, cost=1):
+        retry_after = float(self._take(keys=[self.prefix + key], args=[rate, burst, time.time(), cost]))
+        return retry_after == 0, retry_after
+
+class LocalSharedBuckets:
+    """Stand-in for the Redis store without a Redis server: buckets in a SQLite
+    file, shared by every worker on this machine. Same refill-and-take
+    semantics, each in one locked transaction; for tests and single-host setups."""
+
+    def __init__(self, path):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self.path = path
+        self._local = threading.local()
+        self._next_prune = 0
+        with self._connect() as conn:
+            conn.execute('CREATE TABLE IF NOT EXISTS bucket (key TEXT PRIMARY KEY, tokens REAL, updated REAL)')
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._local.conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+        return conn
+
+    def take(self, key, rate, burst, cost=1):
+        now = time.time()
+        conn = self._connect()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            row = conn.execute('SELECT tokens, updated FROM bucket WHERE key = ?', (key,)).fetchone()
+            tokens, updated = row or (burst, now)
+            tokens = min(burst, tokens + max(0, now - updated) * rate)
+            allowed = tokens >= cost
+            if allowed:
+                tokens -= cost
+            conn.execute('INSERT OR REPLACE INTO bucket (key, tokens, updated) VALUES (?, ?, ?)', (key, tokens, now))
+            if now >= self._next_prune:
+                # Buckets idle this long have refilled; a full bucket carries no state
+                conn.execute('DELETE FROM bucket WHERE updated < ?', (now - 3600,))
+                self._next_prune = now + 60
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        return allowed, 0 if allowed else (cost - tokens) / rate
+
+def get_buckets():
+    app = current_app._get_current_object()
+    buckets = app.extensions.get('ratelimit_buckets')
+    if buckets is None:
+        storage = app.config.get('RATELIMIT_STORAGE')
+        if storage == 'redis':
+            buckets = RedisBuckets(app.config['RATELIMIT_REDIS_URL'])
+        elif storage == 'local':
+            buckets = LocalSharedBuckets(app.config.get('RATELIMIT_LOCAL_PATH')
+                                         or os.path.join(app.instance_path, 'ratelimit.db'))
+        else:
+            buckets = MemoryBuckets()
+        app.extensions['ratelimit_buckets'] = buckets
+    return buckets
+
+def rate_limit(limit, per=60, burst=None, by='ip', methods=None):
+    """Allow `limit` requests every `per` seconds to a route, per client.
+
+    by='ip' counts per remote address; by='vendor' per logged-in vendor,
+    falling back to the address for visitors. burst (default: limit) is how
+    many can arrive back to back. methods restricts the limit to, say, POST.
+    Enforced by RateLimiter before the request reaches the view, on both the
+    WSGI and async read paths.
+    """
+    def decorator(f):
+        f.rate_limits = getattr(f, 'rate_limits', ()) + (
+            (limit / per, burst or limit, by, tuple(methods) if methods else None),)
+        return f
+    return decorator
+
+def _client_key(by):
+    if by == 'vendor' and session.get('vendor_id'):
+        return f"vendor:{session['vendor_id']}"
+    return f'ip:{request.remote_addr}'
+
+class RateLimiter:
+    """Checks the @rate_limit declarations of the requested view."""
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.before_request(self._check)
+
+    def _check(self):
+        if not current_app.config.get('RATELIMIT_ENABLED', True) or request.endpoint is None:
+            return
+        view = current_app.view_functions.get(request.endpoint)
+        for index, (rate, burst, by, methods) in enumerate(getattr(view, 'rate_limits', ())):
+            if methods and request.method not in methods:
+                continue
+            key = f'{request.endpoint}:{index}:{_client_key(by)}'
+            allowed, retry_after = get_buckets().take(key, rate, burst)
+            if not allowed:
+                raise TooManyRequests(retry_after=max(1, round(retry_after)))
+
+class LoadShedder:
+    """Answers 503 straight away when this worker already has LOAD_SHED_MAX_IN_FLIGHT
+    requests in progress, instead of queueing work it can't finish in time.
+
+    In flight counts from before_request until teardown, so a streamed
+    response holds its slot until the body has been sent.
+    """
+
+    def __init__(self, app=None):
+        self.in_flight = 0
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.before_request(self._enter)
+        app.teardown_request(self._leave)
+
+    def _enter(self):
+        limit = current_app.config.get('LOAD_SHED_MAX_IN_FLIGHT', 0)
+        if not limit or request.endpoint in SHED_EXEMPT_ENDPOINTS:
+            return
+        with self._lock:
+            if self.in_flight >= limit:
+                raise ServiceUnavailable(retry_after=current_app.config.get('LOAD_SHED_RETRY_AFTER', 1))
+            self.in_flight += 1
+        g.load_slot = True
+
+    def _leave(self, exc):
+        if g.pop('load_slot', False):
+            with self._lock:
+                self.in_flight -= 1
@@ -0,0 +1,84 @@
+from sqlalchemy import select, delete, literal
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import aliased
+from app import db
+from app.models import Vendor, VendorDownlineDepth
+
+# Guards the recursive queries against a referral cycle created by hand in the DB.
+MAX_DEPTH = 50
+# Levels below a vendor whose sizes are stored for its dashboard
+DOWNLINE_DEPTHS = 5
+
+def _upline_cte(vendor_id):
+    """Every vendor above vendor_id in the referral tree (not including itself)."""
+    upline = select(Vendor.referred_by.label('id'), literal(1).label('depth')) \
+        .where(Vendor.id == vendor_id, Vendor.referred_by.isnot(None)) \
+        .cte('upline', recursive=True)
+    parent = aliased(Vendor)
+    return upline.union_all(
+        select(parent.referred_by, upline.c.depth + 1)
+        .where(parent.id == upline.c.id, parent.referred_by.isnot(None), upline.c.depth < MAX_DEPTH)
+    )
+
+def _adjust_counts(vendor_id, referral_delta, downline_delta, depth_deltas):
+    """Apply a change under vendor_id to its direct referrer and everyone above.
+
+    depth_deltas maps a depth relative to vendor_id (0 for the vendor itself)
+    to the change in vendors there; an ancestor d levels up sees it at depth + d.
+    """
+    vendor = db.session.get(Vendor, vendor_id)
+    if not vendor or not vendor.referred_by:
+        return
+    db.session.query(Vendor).filter(Vendor.id == vendor.referred_by) \
+        .update({'referral_count': Vendor.referral_count + referral_delta}, synchronize_session=False)
+    upline = _upline_cte(vendor_id)
+    db.session.query(Vendor).filter(Vendor.id.in_(select(upline.c.id))) \
+        .update({'downline_count': Vendor.downline_count + downline_delta}, synchronize_session=False)
+
+    ancestors = db.session.execute(
+        select(upline.c.id, upline.c.depth).where(upline.c.depth <= DOWNLINE_DEPTHS)
+    ).all()
+    rows = [{'vendor_id': ancestor_id, 'depth': depth + distance, 'count': delta}
+            for ancestor_id, distance in ancestors
+            for depth, delta in depth_deltas.items()
+            if delta and depth + distance <= DOWNLINE_DEPTHS]
+    if rows:
+        # Added in SQL like the counters above, so concurrent registrations
+        # under the same upline neither lose an increment nor collide on insert.
+        insert = (postgresql if db.session.get_bind().dialect.name == 'postgresql' else sqlite).insert
+        stmt = insert(VendorDownlineDepth).values(rows)
+        db.session.execute(stmt.on_conflict_do_update(
+            index_elements=[VendorDownlineDepth.vendor_id, VendorDownlineDepth.depth],
+            set_={'count': VendorDownlineDepth.count + stmt.excluded['count']}))
+
+def record_referral(vendor):
+    """Count a newly registered (flushed, not yet committed) vendor for its upline."""
+    _adjust_counts(vendor.id, 1, 1, {0: 1})
+
+def remove_from_tree(vendor):
+    """Take a vendor and its whole downline out of its upline's counts before deletion.
+
+    Its direct referrals become roots, so the deleted row is not left referenced.
+    """
+    depth_deltas = {0: -1}
+    for depth, count in downline_by_depth(vendor.id):
+        depth_deltas[depth] = -count
+    _adjust_counts(vendor.id, -1, -(1 + vendor.downline_count), depth_deltas)
+    db.session.execute(delete(VendorDownlineDepth).where(VendorDownlineDepth.vendor_id == vendor.id))
+    db.session.query(Vendor).filter(Vendor.referred_by == vendor.id) \
+        .update({'referred_by': None}, synchronize_session=False)
+
+def downline_by_depth(vendor_id):
+    """[(depth, vendors at that depth)] for the first DOWNLINE_DEPTHS levels below vendor_id."""
+    rows = db.session.execute(
+        select(VendorDownlineDepth.depth, VendorDownlineDepth.count)
+        .where(VendorDownlineDepth.vendor_id == vendor_id, VendorDownlineDepth.count > 0)
+        .order_by(VendorDownlineDepth.depth)
+    ).all()
+    return [(depth, count) for depth, count in rows]
+
+def top_referrers(limit=20):
+    return Vendor.query.filter(Vendor.downline_count > 0) \
+        .order_by(Vendor.downline_count.desc(), Vendor.referral_count.desc()) \
+        .limit(limit) \
+        .all()
@@ -0,0 +1,183 @@
+import random
+import threading
+import time
+from bisect import bisect_right, insort
+from contextlib import contextmanager
+from datetime import datetime
+from flask import current_app, g, has_request_context, request, session
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event, text
+
+STICKY_SESSION_KEY = 'db_primary_until'
+# Heartbeat values remembered per worker; a replica behind all of them is at
+# least as far behind as the oldest, which spans far more than REPLICA_MAX_LAG.
+HEARTBEAT_HISTORY = 1000
+# Views that only read, so a row missing from a lagging replica can't lead them to
+# write a duplicate; every other endpoint, GET or not, reads from the primary.
+REPLICA_ENDPOINTS = ('main.home', 'main.search_snacks', 'main.list_vendors',
+                     'main.search_vendors', 'main.vendor_profile')
+
+@contextmanager
+def use_primary():
+    """Read from the primary inside the block, e.g. for a find-or-create lookup."""
+    if not has_request_context():
+        # Outside a request everything already reads from the primary
+        yield
+        return
+    depth = g.get('db_primary', 0)
+    g.db_primary = depth + 1
+    try:
+        yield
+    finally:
+        g.db_primary = depth
+
+class RoutingSession(Session):
+    """Sends read-only web requests to a healthy replica and everything else to the primary."""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and not self._flushing:
+            router = current_app.extensions.get('replicas')
+            engine = router.read_engine() if router else None
+            if engine is not None:
+                return engine
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+class ReplicaRouter:
+    """Routes GET/HEAD requests to the REPLICA_ENDPOINTS views to read replicas
+    listed in SQLALCHEMY_REPLICA_URIS.
+
+    - Requests that write anything stay on the primary for the rest of the request.
+    - After a commit, the vendor's session sticks to the primary for
+      REPLICA_STICKY_SECONDS so they read their own writes.
+    - Each replica's lag is checked every REPLICA_CHECK_INTERVAL seconds via the
+      replica_heartbeat row written on the primary. Lag is the time since the
+      heartbeat the replica shows was overwritten on the primary, so quiet
+      periods between checks don't count. A replica more than REPLICA_MAX_LAG
+      seconds behind, or one that errors, is skipped until it recovers.
+    """
+
+    def __init__(self, db=None, app=None):
+        self.db = db
+        self.bind_keys = []
+        self._health = {}
+        self._checked_at = 0
+        self._heartbeats = []  # sorted heartbeat values seen on the primary
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        # Must run before db.init_app so the replica engines are created with the others
+        uris = app.config.get('SQLALCHEMY_REPLICA_URIS') or []
+        binds = dict(app.config.get('SQLALCHEMY_BINDS') or {})
+        self.bind_keys = []
+        for index, uri in enumerate(uris):
+            key = f'replica_{index}'
+            binds[key] = uri
+            self.bind_keys.append(key)
+        app.config['SQLALCHEMY_BINDS'] = binds
+        app.extensions['replicas'] = self
+        # A new app has new replicas: forget what was learnt about the old ones
+        self._health = {}
+        self._heartbeats = []
+        self._checked_at = 0
+
+    def _wants_replica(self):
+        if not self.bind_keys or not has_request_context():
+            return False
+        # Only read-only page views; Socket.IO events and background work use the primary.
+        if request.method not in ('GET', 'HEAD') or request.endpoint not in REPLICA_ENDPOINTS:
+            return False
+        if g.get('db_wrote') or g.get('db_primary'):
+            return False
+        return session.get(STICKY_SESSION_KEY, 0) <= time.time()
+
+    def read_engine(self):
+        if not self._wants_replica():
+            return None
+        self._refresh_health()
+        healthy = [key for key in self.bind_keys if self._health.get(key)]
+        if not healthy:
+            return None
+        if 'db_replica' not in g:
+            # Pin one replica per request so all reads see the same snapshot
+            g.db_replica = random.choice(healthy)
+        return self.db.engines[g.db_replica]
+
+    def _refresh_health(self):
+        interval = current_app.config.get('REPLICA_CHECK_INTERVAL', 5)
+        now = time.time()
+        if now - self._checked_at < interval or not self._lock.acquire(blocking=False):
+            return
+        try:
+            self._checked_at = now
+            try:
+                superseded = self._write_heartbeat()
+            except Exception:
+                current_app.logger.exception('Could not write replica heartbeat; reading from primary')
+                self._health.clear()
+                return
+            max_lag = current_app.config.get('REPLICA_MAX_LAG', 10)
+            self._remember_heartbeats(superseded)
+            for key in self.bind_keys:
+                lag = self.replica_lag(key, superseded)
+                self._health[key] = lag is not None and lag <= max_lag
+                if not self._health[key]:
+                    current_app.logger.warning('Replica %s unavailable (lag: %s), reading from primary', key, lag)
+        finally:
+            self._lock.release()
+
+    def _write_heartbeat(self):
+        """Overwrite the primary's heartbeat and return the value it replaced (None if new)."""
+        with self.db.engines[None].begin() as conn:
+            previous = _as_datetime(conn.execute(
+                text('SELECT updated_at FROM replica_heartbeat WHERE id = 1')).scalar())
+            now = datetime.utcnow()
+            updated = conn.execute(text('UPDATE replica_heartbeat SET updated_at = :now WHERE id = 1'),
+                                   {'now': now})
+            if not updated.rowcount:
+                conn.execute(text('INSERT INTO replica_heartbeat (id, updated_at) VALUES (1, :now)'),
+                             {'now': now})
+        return previous
+
+    def _remember_heartbeats(self, superseded):
+        # Every heartbeat value is the time it was written, so the value that
+        # followed a replica's heartbeat is when the replica's copy went stale.
+        if superseded is not None and superseded not in self._heartbeats:
+            insort(self._heartbeats, superseded)
+        del self._heartbeats[:-HEARTBEAT_HISTORY]
+
+    def replica_lag(self, key, superseded=None):
+        """Seconds since the heartbeat the replica shows was overwritten on the
+        primary (0 if it is current), or None if unreachable."""
+        try:
+            with self.db.engines[key].connect() as conn:
+                updated_at = _as_datetime(conn.execute(
+                    text('SELECT updated_at FROM replica_heartbeat WHERE id = 1')).scalar())
+        except Exception:
+            current_app.logger.exception('Replica %s health check failed', key)
+            return None
+        if updated_at is None:
+            return None
+        if superseded is None or updated_at >= superseded:
+            # It has everything up to the write this check just made
+            return 0.0
+        # superseded is in the history and newer, so a later value always exists
+        overwritten_at = self._heartbeats[bisect_right(self._heartbeats, updated_at)]
+        return max(0.0, (datetime.utcnow() - overwritten_at).total_seconds())
+
+def _as_datetime(value):
+    if isinstance(value, str):
+        return datetime.fromisoformat(value)
+    return value
+
+@event.listens_for(RoutingSession, 'after_flush')
+def _mark_wrote(db_session, flush_context):
+    if has_request_context():
+        g.db_wrote = True
+
+@event.listens_for(RoutingSession, 'after_commit')
+def _stick_to_primary(db_session):
+    router = current_app.extensions.get('replicas')
+    if router and router.bind_keys and has_request_context() and g.get('db_wrote'):
+        session[STICKY_SESSION_KEY] = time.time() + current_app.config.get('REPLICA_STICKY_SECONDS', 10)
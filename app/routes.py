@@ -1,32 +1,66 @@
-import os
-import secrets
-from flask import render_template, url_for, flash, redirect, request, Blueprint, session, current_app
+from flask import render_template, stream_template, url_for, flash, get_flashed_messages, redirect, request, Blueprint, session, current_app, jsonify
 from flask_login import login_user, logout_user, login_required
+from flask_wtf.csrf import generate_csrf
 from functools import wraps
 from datetime import datetime, timedelta
 from werkzeug.utils import secure_filename
-from sqlalchemy import or_, func
-
-from app import db, bcrypt, login_manager
-from app.models import Vendor, Snack, Review, Ad
+from sqlalchemy import or_
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import joinedload
+
+from app import db, bcrypt, login_manager, csrf, queries
+from app.models import Vendor, Snack, Review, Ad, ChatMessage
+from app.feed import prepare_snack_event, publish_snack_event
+from app.chat import get_or_create_conversation, inbox_for, forget_conversations
+from app.referrals import record_referral, remove_from_tree, downline_by_depth, top_referrers
+from app.media import generate_poster, send_media
+from app.suggest import get_suggest_index, SUGGEST_KINDS
+from app.zone_feeds import get_zone_feeds
+from app.ranking import get_ranking
+from app.archive import forget_vendor
+from app.ratelimit import rate_limit
+from app.availability import UNIQUE_FIELDS, TAKEN_MESSAGES, UNKNOWN_REFERRAL_MESSAGE, check_registration, get_taken_values
+from app.profiler import list_profiles, load_profile, collapsed_stacks, hot_frames, profile_token
+from app.storage import get_storage, is_video, new_key, key_from_token, upload_token, verify_upload_grant, UPLOAD_FOLDERS
 from app.forms import RegistrationForm, LoginForm, AddSnackForm, SearchForm, VendorEditForm, SnackEditForm, UpdateProfileForm, ReviewForm, AdForm, VendorSearchForm
 
 # Create a Blueprint named 'main'
 main = Blueprint('main', __name__)
 
-# --- Reverted FUNCTION TO UPLOAD TO LOCAL FILE SYSTEM ---
-def save_uploaded_file(file, folder):
+# Uploads go through the configured media storage (local disk or S3, see app/storage.py)
+def save_uploaded_file(file, folder, token=None):
+    """Store an uploaded file and return its key, or accept a direct-to-storage upload token."""
     if file:
-        random_hex = secrets.token_hex(8)
-        _, f_ext = os.path.splitext(file.filename)
-        file_name = random_hex + f_ext
-        upload_path = os.path.join(current_app.root_path, 'static', folder, file_name)
-        if not os.path.exists(os.path.dirname(upload_path)):
-            os.makedirs(os.path.dirname(upload_path))
-        file.save(upload_path)
-        return os.path.join(folder, file_name).replace('\\', '/')
+        return get_storage().save(file, new_key(folder, file.filename))
+    if token:
+        return key_from_token(token, folder)
     return None
-# ---------------------------------------------
+
+# Streamed pages: Jinja yields a chunk per template tag, far too small to write
+# (and compress) one at a time, so they're regrouped into chunks of this size.
+STREAM_CHUNK_BYTES = 16 * 1024
+
+def _rechunk(chunks):
+    buffer, size = [], 0
+    for chunk in chunks:
+        buffer.append(chunk)
+        size += len(chunk)
+        if size >= STREAM_CHUNK_BYTES:
+            yield ''.join(buffer)
+            buffer, size = [], 0
+    if buffer:
+        yield ''.join(buffer)
+
+def stream_page(template_name, **context):
+    """Render a template as it is sent; pass queries with .yield_per() so rows are loaded batch by batch too.
+
+    The session cookie is saved before the body renders, so anything the
+    template would change in the session happens here first: flashed messages
+    are popped (base.html shows `flashed_messages`) and the CSRF token created.
+    """
+    context['flashed_messages'] = get_flashed_messages(with_categories=True)
+    generate_csrf()
+    return current_app.response_class(_rechunk(stream_template(template_name, **context)))
 
 # User loader function for Flask-Login
 @login_manager.user_loader
@@ -73,14 +107,25 @@ def inject_globals():
 @main.route("/home")
 def home():
     search_form = SearchForm()
-    one_day_ago = datetime.utcnow() - timedelta(days=1)
-    fresh_snacks = Snack.query.filter(Snack.date_posted > one_day_ago).order_by(Snack.date_posted.desc()).all()
-    vendors = Vendor.query.order_by(Vendor.business_name).all()
-    ads = Ad.query.filter_by(is_active=True).all()
+    zone = request.args.get('zone', '').strip()
+    state = request.args.get('state', '').strip() if not zone else ''
+    feeds = get_zone_feeds()
+    ranking = get_ranking()
+    snack_ids = feeds.snack_ids(zone, state)
+    within = set(snack_ids) if zone or state else None
+    trending_ids, top_rated_ids = ranking.trending(within=within), ranking.top_rated(within=within)
+    snacks = db.session.scalars(queries.snacks_by_ids(set(snack_ids + trending_ids + top_rated_ids))).all()
+    vendors = db.session.scalars(queries.all_vendors()).all()
+    ads = db.session.scalars(queries.active_ads()).all()
     
-    return render_template('home.html', snacks=fresh_snacks, vendors=vendors, search_form=search_form, ads=ads)
+    return render_template('home.html', snacks=queries.in_id_order(snacks, snack_ids), vendors=vendors,
+                           search_form=search_form, ads=ads, zone=zone, state=state, facets=feeds.facets(),
+                           trending=queries.in_id_order(snacks, trending_ids),
+                           top_rated=queries.in_id_order(snacks, top_rated_ids),
+                           ratings=ranking.stats(trending_ids + top_rated_ids))
 
 @main.route("/search", methods=['GET'])
+@rate_limit(60, per=60, burst=20)
 def search_snacks():
     search_form = SearchForm(request.args)
     results = []
@@ -89,14 +134,10 @@ def search_snacks():
     snack_type = search_form.snack_type.data
 
     if search_form.validate():
-        query = db.session.query(Snack).join(Vendor).filter(
-            Snack.date_posted > datetime.utcnow() - timedelta(days=1)
-        )
-        if location_zone:
-            query = query.filter(Vendor.location_zone.ilike(f'%{location_zone}%'))
-        if snack_type:
-            query = query.filter(Snack.name.ilike(f'%{snack_type}%'))
-        results = query.order_by(Snack.date_posted.desc()).all()
+        # A zone no other zone name contains reads its materialized feed
+        feeds = get_zone_feeds()
+        snack_ids = feeds.zone_search_ids(location_zone)
+        results = db.session.scalars(queries.search_snacks(location_zone, snack_type, snack_ids)).all()
 
     return render_template('search_results.html', search_form=search_form, results=results)
 
@@ -106,12 +147,8 @@ def register_vendor():
     if form.validate_on_submit():
         hashed_password = bcrypt.generate_password_hash(form.password.data).decode('utf-8')
         
-        logo_url = save_uploaded_file(form.logo_file.data, 'logos') if form.logo_file.data else 'logos/default.png'
+        logo_url = save_uploaded_file(form.logo_file.data, 'logos', form.logo_token.data) or 'logos/default.png'
 
-        referrer_vendor = None
-        if form.referral_code.data:
-            referrer_vendor = Vendor.query.filter_by(referral_code=form.referral_code.data).first()
-        
         vendor = Vendor(
             business_name=form.business_name.data,
             contact_name=form.contact_name.data,
@@ -121,15 +158,26 @@ def register_vendor():
             email=form.email.data,
             password=hashed_password,
             logo_url=logo_url,
-            referred_by=referrer_vendor.id if referrer_vendor else None
+            referred_by=form.referrer_id
         )
         db.session.add(vendor)
-        db.session.commit()
+        try:
+            if form.referrer_id:
+                db.session.flush()
+                record_referral(vendor)
+            db.session.commit()
+        except IntegrityError:
+            # Someone registered the same details since the form was checked
+            db.session.rollback()
+            get_taken_values().add(form.data)
+            flash('That email, business name or WhatsApp number was registered just now. Please choose a different one.', 'danger')
+            return render_template('register_vendor.html', form=form)
         flash('Your account has been created! You can now log in.', 'success')
         return redirect(url_for('main.login'))
     return render_template('register_vendor.html', form=form)
 
 @main.route("/login", methods=['GET', 'POST'])
+@rate_limit(10, per=60, burst=5, methods=['POST'])
 def login():
     form = LoginForm()
     if form.validate_on_submit():
@@ -159,18 +207,60 @@ def vendor_profile(vendor_id):
     if not vendor:
         return 'Vendor not found', 404
     
-    one_day_ago = datetime.utcnow() - timedelta(days=1)
-    
-    snacks_with_reviews = db.session.query(Snack, func.avg(Review.rating).label('average_rating')) \
-        .outerjoin(Review) \
-        .filter(Snack.vendor_id == vendor.id) \
-        .filter(Snack.date_posted > one_day_ago) \
-        .group_by(Snack.id) \
-        .order_by(Snack.date_posted.desc()) \
-        .all()
-        
-    return render_template('vendor_profile.html', vendor=vendor, snacks=snacks_with_reviews)
+    snacks_with_reviews = db.session.execute(queries.vendor_snacks_with_rating(vendor.id)).all()
+    rating_totals = db.session.execute(queries.vendor_rating_totals(vendor.id)).one()
+
+    return render_template('vendor_profile.html', vendor=vendor, snacks=snacks_with_reviews, rating_totals=rating_totals)
     
+@main.route("/media/<path:filename>")
+def media(filename):
+    return send_media(filename)
+
+@main.route("/api/uploads/presign", methods=['POST'])
+@rate_limit(20, per=60, by='vendor')
+def presign_upload():
+    """Hand the browser a URL to upload straight to media storage, bypassing our workers."""
+    data = request.get_json(silent=True) or {}
+    folder = data.get('folder')
+    filename = data.get('filename') or ''
+    if folder not in UPLOAD_FOLDERS:
+        return jsonify({'error': 'Unknown upload folder.'}), 400
+
+    # Logos need a vendor or the grant from the registration page; snack media a vendor, ads an admin.
+    vendor = db.session.get(Vendor, session['vendor_id']) if session.get('vendor_id') else None
+    if ((folder == 'logos' and not (vendor or verify_upload_grant(data.get('grant'))))
+            or (folder == 'snack_media' and not vendor) or (folder == 'ads' and not (vendor and vendor.is_admin))):
+        return jsonify({'error': 'Please log in to upload.'}), 403
+
+    allowed = ('.jpg', '.jpeg', '.png') if folder == 'logos' else ('.jpg', '.jpeg', '.png', '.mp4', '.mov')
+    if not filename.lower().endswith(allowed):
+        return jsonify({'error': 'File type not allowed.'}), 400
+
+    key = new_key(folder, filename)
+    upload = get_storage().presign_upload(key, current_app.config['MEDIA_UPLOAD_MAX_BYTES'],
+                                          current_app.config['MEDIA_UPLOAD_EXPIRES'])
+    return jsonify({'upload': upload, 'token': upload_token(key)})
+
+@main.route("/media/upload", methods=['POST'])
+@csrf.exempt
+@rate_limit(20, per=60)
+def direct_upload():
+    # Local stand-in for an object store's presigned POST; the signed policy is the auth.
+    storage = get_storage()
+    if not hasattr(storage, 'verify_local_upload'):
+        return 'Direct uploads go to the object store.', 404
+    # Refuse oversized bodies before parsing them (MAX_CONTENT_LENGTH also caps chunked ones)
+    if request.content_length and request.content_length > current_app.config['MAX_CONTENT_LENGTH']:
+        return 'File too large.', 413
+    policy = storage.verify_local_upload(request.form, current_app.config['MEDIA_UPLOAD_EXPIRES'])
+    file = request.files.get('file')
+    if not policy or not file:
+        return 'Invalid upload policy.', 403
+    if request.content_length and request.content_length > policy['max_bytes']:
+        return 'File too large.', 413
+    storage.save(file, policy['key'])
+    return '', 204
+
 @main.route("/chat/<int:vendor_id>")
 @vendor_only
 def chat(vendor_id):
@@ -178,12 +268,20 @@ def chat(vendor_id):
     if not vendor_to_chat_with:
         flash('Vendor not found.', 'danger')
         return redirect(url_for('main.home'))
+    if vendor_to_chat_with.id == session.get('vendor_id'):
+        flash('You cannot chat with yourself.', 'info')
+        return redirect(url_for('main.vendor_dashboard'))
 
-    chat_history = [] 
+    conversation = get_or_create_conversation(session.get('vendor_id'), vendor_to_chat_with.id)
+    chat_history = ChatMessage.query.filter_by(conversation_id=conversation.id) \
+        .order_by(ChatMessage.id.desc()) \
+        .limit(50) \
+        .all()[::-1]
 
-    return render_template('chat.html', vendor_to_chat_with=vendor_to_chat_with, chat_history=chat_history)
+    return render_template('chat.html', vendor_to_chat_with=vendor_to_chat_with, conversation=conversation, chat_history=chat_history)
 
 @main.route("/snack/<int:snack_id>/review", methods=['GET', 'POST'])
+@rate_limit(5, per=300, methods=['POST'])
 def review_snack(snack_id):
     snack = db.session.get(Snack, snack_id)
     if not snack:
@@ -207,28 +305,43 @@ def review_snack(snack_id):
 @main.route("/vendors")
 def list_vendors():
     search_form = VendorSearchForm()
-    vendors = Vendor.query.order_by(Vendor.business_name).all()
-    return render_template('list_vendors.html', vendors=vendors, search_form=search_form)
+    vendors = Vendor.query.order_by(Vendor.business_name).yield_per(current_app.config['STREAM_YIELD_PER'])
+    return stream_page('list_vendors.html', vendors=vendors, search_form=search_form)
 
 @main.route("/search_vendors", methods=['GET'])
+@rate_limit(60, per=60, burst=20)
 def search_vendors():
     search_form = VendorSearchForm(request.args)
     results = []
 
     business_name = search_form.business_name.data
     location_zone = search_form.location_zone.data
-    
-    query = Vendor.query
-
-    if business_name:
-        query = query.filter(Vendor.business_name.ilike(f'%{business_name}%'))
-    if location_zone:
-        query = query.filter(Vendor.location_zone.ilike(f'%{location_zone}%'))
 
-    results = query.order_by(Vendor.business_name).all()
+    results = db.session.scalars(queries.search_vendors(business_name, location_zone)).all()
 
     return render_template('vendor_search_results.html', search_form=search_form, results=results)
 
+@main.route("/api/suggest")
+def suggest():
+    """Typeahead for the search boxes: ?q=prefix&type=snack|vendor|zone (repeatable)."""
+    kinds = tuple(k for k in request.args.getlist('type') if k in SUGGEST_KINDS) or SUGGEST_KINDS
+    limit = min(request.args.get('limit', 8, type=int), 20)
+    suggestions = get_suggest_index().suggest(request.args.get('q', ''), kinds, limit)
+    return jsonify({'suggestions': suggestions})
+
+@main.route("/api/availability")
+@rate_limit(30, per=60)
+def availability():
+    """Live registration checks: ?email=&business_name=&whatsapp_number=&referral_code= (any of them)."""
+    values = {field: request.args[field] for field in UNIQUE_FIELDS + ('referral_code',) if request.args.get(field)}
+    taken, referrer_id = check_registration(**values)
+    result = {field: {'ok': field not in taken, 'message': TAKEN_MESSAGES[field] if field in taken else None}
+              for field in values if field in UNIQUE_FIELDS}
+    if 'referral_code' in values:
+        result['referral_code'] = {'ok': referrer_id is not None,
+                                   'message': None if referrer_id else UNKNOWN_REFERRAL_MESSAGE}
+    return jsonify(result)
+
 
 @main.route("/dashboard")
 @vendor_only
@@ -242,9 +355,12 @@ def vendor_dashboard():
     one_day_ago = datetime.utcnow() - timedelta(days=1)
     snacks = Snack.query.filter_by(vendor_id=vendor.id).filter(Snack.date_posted > one_day_ago).order_by(Snack.date_posted.desc()).all()
     
-    referrals_count = Vendor.query.filter_by(referred_by=vendor.id).count()
+    referrals_count = vendor.referral_count
+    referral_depths = downline_by_depth(vendor.id) if vendor.downline_count else []
+    conversations = inbox_for(vendor.id)
 
-    return render_template('vendor_dashboard.html', vendor=vendor, snacks=snacks, referrals_count=referrals_count)
+    return render_template('vendor_dashboard.html', vendor=vendor, snacks=snacks, referrals_count=referrals_count,
+                           referral_depths=referral_depths, conversations=conversations)
 
 @main.route("/add_snack", methods=['GET', 'POST'])
 @vendor_only
@@ -254,12 +370,15 @@ def add_snack():
     vendor = db.session.get(Vendor, vendor_id)
     
     if form.validate_on_submit():
-        media_url = None
         media_type = 'image'
-        if form.media_file.data:
-            media_url = save_uploaded_file(form.media_file.data, 'snack_media')
-            if media_url and (media_url.lower().endswith('.mp4') or media_url.lower().endswith('.mov')):
-                media_type = 'video'
+        poster_url = None
+        media_url = save_uploaded_file(form.media_file.data, 'snack_media', form.media_token.data)
+        if not media_url:
+            flash('Please upload a photo or video of your snack.', 'danger')
+            return render_template('add_snack.html', form=form)
+        if is_video(media_url):
+            media_type = 'video'
+            poster_url = generate_poster(media_url)
             
         snack = Snack(
             name=form.name.data,
@@ -267,10 +386,12 @@ def add_snack():
             price=form.price.data,
             media_url=media_url,
             media_type=media_type,
+            poster_url=poster_url,
             vendor_id=vendor.id
         )
         db.session.add(snack)
         db.session.commit()
+        publish_snack_event('upsert', snack)
         flash('Snack added successfully!', 'success')
         return redirect(url_for('main.vendor_dashboard'))
     return render_template('add_snack.html', form=form)
@@ -285,8 +406,10 @@ def delete_snack(snack_id):
         flash('You do not have permission to delete this snack.', 'danger')
         return redirect(url_for('main.vendor_dashboard'))
     
+    publish_delete = prepare_snack_event('delete', snack)
     db.session.delete(snack)
     db.session.commit()
+    publish_delete()
     flash('Snack deleted successfully.', 'success')
     return redirect(url_for('main.vendor_dashboard'))
 
@@ -306,6 +429,7 @@ def edit_snack(snack_id):
     if form.validate_on_submit():
         form.populate_obj(snack)
         db.session.commit()
+        publish_snack_event('upsert', snack)
         flash('Snack details updated successfully!', 'success')
         return redirect(url_for('main.vendor_dashboard'))
 
@@ -314,38 +438,42 @@ def edit_snack(snack_id):
 @main.route("/admin", methods=['GET'])
 @admin_only
 def admin_dashboard():
+    # The three tables are streamed: each query runs as the template reaches it
+    # and is read yield_per rows at a time, so memory doesn't grow with the tables.
+    yield_per = current_app.config['STREAM_YIELD_PER']
+
     # Handle search for vendors
     vendor_search_term = request.args.get('vendor_search_term', '')
+    vendors = Vendor.query
     if vendor_search_term:
-        vendors = Vendor.query.filter(or_(
+        vendors = vendors.filter(or_(
             Vendor.business_name.ilike(f'%{vendor_search_term}%'),
             Vendor.email.ilike(f'%{vendor_search_term}%')
-        )).order_by(Vendor.business_name).all()
-    else:
-        vendors = Vendor.query.order_by(Vendor.business_name).all()
+        ))
+    vendors = vendors.order_by(Vendor.business_name).yield_per(yield_per)
 
     # Handle search for snacks
     snack_search_term = request.args.get('snack_search_term', '')
+    all_snacks = Snack.query.options(joinedload(Snack.vendor))
     if snack_search_term:
-        all_snacks = Snack.query.filter(Snack.name.ilike(f'%{snack_search_term}%')).order_by(Snack.date_posted.desc()).all()
-    else:
-        all_snacks = Snack.query.order_by(Snack.date_posted.desc()).all()
+        all_snacks = all_snacks.filter(Snack.name.ilike(f'%{snack_search_term}%'))
+    all_snacks = all_snacks.order_by(Snack.date_posted.desc()).yield_per(yield_per)
 
     # Handle search for ads
     ad_search_term = request.args.get('ad_search_term', '')
+    all_ads = Ad.query
     if ad_search_term:
-        all_ads = Ad.query.filter(Ad.title.ilike(f'%{ad_search_term}%')).order_by(Ad.date_posted.desc()).all()
-    else:
-        all_ads = Ad.query.order_by(Ad.date_posted.desc()).all()
+        all_ads = all_ads.filter(Ad.title.ilike(f'%{ad_search_term}%'))
+    all_ads = all_ads.order_by(Ad.date_posted.desc()).yield_per(yield_per)
 
     # Determine which tab to show after search
     active_tab = request.args.get('tab', 'vendors')
     
-    return render_template('admin_dashboard.html', 
-                           vendors=vendors, 
-                           all_snacks=all_snacks, 
-                           all_ads=all_ads,
-                           active_tab=active_tab)
+    return stream_page('admin_dashboard.html', 
+                       vendors=vendors, 
+                       all_snacks=all_snacks, 
+                       all_ads=all_ads,
+                       active_tab=active_tab)
 
 @main.route("/verify_vendor/<int:vendor_id>", methods=['POST'])
 @admin_only
@@ -378,6 +506,9 @@ def admin_edit_vendor(vendor_id):
 def admin_delete_vendor(vendor_id):
     vendor_to_delete = db.session.get(Vendor, vendor_id)
     if vendor_to_delete and not vendor_to_delete.is_admin:
+        remove_from_tree(vendor_to_delete)
+        forget_vendor(vendor_to_delete)
+        forget_conversations(vendor_to_delete.id)
         db.session.delete(vendor_to_delete)
         db.session.commit()
         flash(f'Vendor "{vendor_to_delete.business_name}" has been deleted!', 'success')
@@ -385,6 +516,39 @@ def admin_delete_vendor(vendor_id):
         flash('Cannot delete this vendor.', 'danger')
     return redirect(url_for('main.admin_dashboard'))
 
+@main.route("/admin/referrals")
+@admin_only
+def admin_referrals():
+    leaders = top_referrers(limit=50)
+    return render_template('admin_referrals.html', leaders=leaders)
+
+@main.route("/admin/profiles")
+@admin_only
+def admin_profiles():
+    profiles = list_profiles(current_app.config['PROFILER_DIR'])
+    return render_template('admin_profiles.html', profiles=profiles, token=profile_token(session['vendor_id']),
+                           sample_rate=current_app.config.get('PROFILER_SAMPLE_RATE', 0))
+
+@main.route("/admin/profiles/<profile_id>")
+@admin_only
+def admin_profile(profile_id):
+    profile = load_profile(current_app.config['PROFILER_DIR'], profile_id)
+    if not profile:
+        flash('Profile not found.', 'danger')
+        return redirect(url_for('main.admin_profiles'))
+    return render_template('admin_profile.html', profile=profile, frames=hot_frames(profile))
+
+@main.route("/admin/profiles/<profile_id>/collapsed")
+@admin_only
+def admin_profile_collapsed(profile_id):
+    profile = load_profile(current_app.config['PROFILER_DIR'], profile_id)
+    if not profile:
+        return 'Profile not found', 404
+    return collapsed_stacks(profile), 200, {
+        'Content-Type': 'text/plain; charset=utf-8',
+        'Content-Disposition': f'attachment; filename={profile_id}.collapsed.txt',
+    }
+
 @main.route("/admin/edit_snack/<int:snack_id>", methods=['GET', 'POST'])
 @admin_only
 def admin_edit_snack(snack_id):
@@ -397,6 +561,7 @@ def admin_edit_snack(snack_id):
     if form.validate_on_submit():
         form.populate_obj(snack)
         db.session.commit()
+        publish_snack_event('upsert', snack)
         flash('Snack details updated successfully!', 'success')
         return redirect(url_for('main.admin_dashboard'))
 
@@ -407,8 +572,10 @@ def admin_edit_snack(snack_id):
 def admin_delete_snack(snack_id):
     snack_to_delete = db.session.get(Snack, snack_id)
     if snack_to_delete:
+        publish_delete = prepare_snack_event('delete', snack_to_delete)
         db.session.delete(snack_to_delete)
         db.session.commit()
+        publish_delete()
         flash(f'Snack "{snack_to_delete.name}" has been deleted!', 'success')
     else:
         flash('Snack not found.', 'danger')
@@ -421,8 +588,8 @@ def admin_edit_profile():
     admin = db.session.get(Vendor, session.get('vendor_id'))
     form = UpdateProfileForm(obj=admin)
     if form.validate_on_submit():
-        if form.logo_file.data:
-            logo_url = save_uploaded_file(form.logo_file.data, 'logos')
+        logo_url = save_uploaded_file(form.logo_file.data, 'logos', form.logo_token.data)
+        if logo_url:
             admin.logo_url = logo_url
         
         form.populate_obj(admin)
@@ -441,8 +608,8 @@ def edit_profile():
         
     form = UpdateProfileForm(obj=vendor)
     if form.validate_on_submit():
-        if form.logo_file.data:
-            logo_url = save_uploaded_file(form.logo_file.data, 'logos')
+        logo_url = save_uploaded_file(form.logo_file.data, 'logos', form.logo_token.data)
+        if logo_url:
             vendor.logo_url = logo_url
         
         form.populate_obj(vendor)
@@ -460,20 +627,19 @@ def edit_profile():
 def add_ad():
     form = AdForm()
     if form.validate_on_submit():
-        media_url = None
         media_type = 'image'
-        if form.media_file.data:
-            media_url = save_uploaded_file(form.media_file.data, 'ads')
-            if media_url and (media_url.lower().endswith('.mp4')):
-                media_type = 'video'
-            else:
-                media_type = 'image'
+        poster_url = None
+        media_url = save_uploaded_file(form.media_file.data, 'ads', form.media_token.data)
+        if is_video(media_url):
+            media_type = 'video'
+            poster_url = generate_poster(media_url)
         
         ad = Ad(
             title=form.title.data,
             content=form.content.data,
             media_url=media_url,
             media_type=media_type,
+            poster_url=poster_url,
             link_url=form.link_url.data,
             is_active=form.is_active.data
         )
@@ -493,13 +659,15 @@ def edit_ad(ad_id):
     
     form = AdForm(obj=ad)
     if form.validate_on_submit():
-        if form.media_file.data:
-            media_url = save_uploaded_file(form.media_file.data, 'ads')
+        media_url = save_uploaded_file(form.media_file.data, 'ads', form.media_token.data)
+        if media_url:
             ad.media_url = media_url
-            if media_url and (media_url.lower().endswith('.mp4')):
-                media_type = 'video'
+            if is_video(media_url):
+                ad.media_type = 'video'
+                ad.poster_url = generate_poster(media_url)
             else:
                 ad.media_type = 'image'
+                ad.poster_url = None
         
         form.populate_obj(ad)
         db.session.commit()
@@ -0,0 +1,35 @@
+// Live checks for registration inputs marked with data-availability="<field>":
+// asks /api/availability once the user leaves a field and flags values that
+// are already taken (or unknown referral codes) before the form is submitted.
+(function() {
+    var availabilityUrl = document.currentScript.dataset.availabilityUrl;
+
+    document.querySelectorAll('input[data-availability]').forEach(function(input) {
+        if (!window.fetch) return;
+        var field = input.dataset.availability;
+        var feedback = document.createElement('div');
+        feedback.className = 'invalid-feedback';
+        input.insertAdjacentElement('afterend', feedback);
+
+        var lastValue = null;
+        input.addEventListener('change', function() {
+            var value = input.value.trim();
+            if (value === lastValue) return;
+            lastValue = value;
+            if (!value) {
+                input.classList.remove('is-invalid');
+                return;
+            }
+            var params = new URLSearchParams();
+            params.set(field, value);
+            fetch(availabilityUrl + '?' + params).then(function(response) {
+                return response.ok ? response.json() : {};
+            }).then(function(data) {
+                var check = data[field];
+                if (value !== lastValue || !check) return;
+                feedback.textContent = check.message || '';
+                input.classList.toggle('is-invalid', !check.ok);
+            }).catch(function() {});
+        });
+    });
+})();
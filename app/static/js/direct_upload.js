@@ -0,0 +1,48 @@
+// Sends files marked with data-direct-upload straight to media storage before the
+// form is submitted, so the bytes never pass through the app server. The form then
+// only carries a signed token for the stored file. Any failure falls back to a
+// normal multipart upload. Visitors registering have no session yet, so they
+// send the page's data-upload-grant instead.
+(function() {
+    var script = document.currentScript;
+    var presignUrl = script.dataset.presignUrl;
+    var csrfToken = document.querySelector('meta[name="csrf-token"]').content;
+
+    function directUpload(input) {
+        var file = input.files[0];
+        return fetch(presignUrl, {
+            method: 'POST',
+            headers: {'Content-Type': 'application/json', 'X-CSRFToken': csrfToken},
+            body: JSON.stringify({folder: input.dataset.directUpload, filename: file.name, grant: input.dataset.uploadGrant})
+        }).then(function(response) {
+            if (!response.ok) throw new Error('presign failed');
+            return response.json();
+        }).then(function(data) {
+            var body = new FormData();
+            Object.keys(data.upload.fields).forEach(function(name) {
+                body.append(name, data.upload.fields[name]);
+            });
+            body.append('file', file);
+            return fetch(data.upload.url, {method: 'POST', body: body}).then(function(response) {
+                if (!response.ok) throw new Error('upload failed');
+                input.form.querySelector('[name="' + input.dataset.tokenField + '"]').value = data.token;
+                input.value = '';
+            });
+        });
+    }
+
+    document.querySelectorAll('input[type="file"][data-direct-upload]').forEach(function(input) {
+        var form = input.form;
+        form.addEventListener('submit', function(event) {
+            if (!input.files.length || !window.fetch) return;
+            event.preventDefault();
+            var submitButton = form.querySelector('[type="submit"]');
+            if (submitButton) submitButton.disabled = true;
+            directUpload(input).catch(function() {
+                // Keep the file in the input; it will be uploaded with the form instead.
+            }).then(function() {
+                form.submit();
+            });
+        });
+    });
+})();
@@ -0,0 +1,36 @@
+// Typeahead for inputs marked with data-suggest="snack|vendor|zone": fetches
+// matches from /api/suggest as the user types and offers them via a <datalist>.
+(function() {
+    var suggestUrl = document.currentScript.dataset.suggestUrl;
+
+    document.querySelectorAll('input[data-suggest]').forEach(function(input, i) {
+        if (!window.fetch) return;
+        var list = document.createElement('datalist');
+        list.id = 'suggest-' + (input.id || i);
+        input.setAttribute('list', list.id);
+        input.setAttribute('autocomplete', 'off');
+        input.insertAdjacentElement('afterend', list);
+
+        var timer = null, lastQuery = null;
+        input.addEventListener('input', function() {
+            clearTimeout(timer);
+            timer = setTimeout(function() {
+                var query = input.value.trim();
+                if (!query || query === lastQuery) return;
+                lastQuery = query;
+                var params = new URLSearchParams({q: query, type: input.dataset.suggest});
+                fetch(suggestUrl + '?' + params).then(function(response) {
+                    return response.ok ? response.json() : {suggestions: []};
+                }).then(function(data) {
+                    if (query !== lastQuery) return;
+                    list.innerHTML = '';
+                    data.suggestions.forEach(function(suggestion) {
+                        var option = document.createElement('option');
+                        option.value = suggestion.text;
+                        list.appendChild(option);
+                    });
+                }).catch(function() {});
+            }, 120);
+        });
+    });
+})();
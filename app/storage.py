@@ -0,0 +1,234 @@
+import os
+import re
+import time
+import secrets
+import mimetypes
+import click
+from flask import current_app, url_for
+from flask.cli import with_appcontext
+from itsdangerous import URLSafeTimedSerializer, BadSignature
+from werkzeug.security import safe_join
+
+try:
+    import boto3
+except ImportError:  # Only needed when MEDIA_STORAGE = 's3'; see requirements-s3.txt
+    boto3 = None
+
+# Files shipped with the app rather than uploaded; always served from static.
+BUNDLED_MEDIA = ('logos/default.png', 'logos/admin_logo.png')
+UPLOAD_FOLDERS = ('snack_media', 'ads', 'logos')
+VIDEO_EXTENSIONS = ('.mp4', '.mov')
+# Every key new_key() makes starts with this, so the sweep can tell uploads apart
+# from files shipped in app/static (or uploaded before the prefix existed).
+UPLOAD_PREFIX = 'upload-'
+# Keys made by new_key() (and their video posters); anything else in the folders is left alone
+UPLOAD_KEY = re.compile(r'^(?:%s)/%s[0-9a-f]{16}(?:\.poster)?\.\w+$' % ('|'.join(UPLOAD_FOLDERS), UPLOAD_PREFIX))
+
+def is_video(key):
+    return bool(key) and key.lower().endswith(VIDEO_EXTENSIONS)
+
+def new_key(folder, filename):
+    _, f_ext = os.path.splitext(filename or '')
+    return f'{folder}/{UPLOAD_PREFIX}{secrets.token_hex(8)}{f_ext.lower()}'
+
+def _content_type(key):
+    return mimetypes.guess_type(key)[0] or 'application/octet-stream'
+
+class LocalStorage:
+    """Uploads kept under app/static, as before. Needs a shared disk across nodes."""
+
+    def __init__(self, root):
+        self.root = root
+
+    def _path(self, key):
+        path = safe_join(self.root, key)
+        if not path:
+            raise ValueError(f'Invalid media key: {key}')
+        return path
+
+    def save(self, file, key):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        file.save(path)
+        return key
+
+    def exists(self, key):
+        return os.path.isfile(self._path(key))
+
+    def delete(self, key):
+        path = self._path(key)
+        if os.path.exists(path):
+            os.remove(path)
+
+    def local_path(self, key):
+        return self._path(key)
+
+    def list(self, folder):
+        """(key, modified timestamp) of every file in a folder."""
+        directory = self._path(folder)
+        if not os.path.isdir(directory):
+            return
+        for name in os.listdir(directory):
+            path = os.path.join(directory, name)
+            if os.path.isfile(path):
+                yield f'{folder}/{name}', os.path.getmtime(path)
+
+    def url(self, key):
+        # Videos go through the Range-capable media endpoint
+        endpoint = 'main.media' if is_video(key) else 'static'
+        return url_for(endpoint, filename=key)
+
+    def presign_upload(self, key, max_bytes, expires_in):
+        """Mimic an S3 presigned POST so the browser code is the same for both backends."""
+        return {
+            'url': url_for('main.direct_upload'),
+            'fields': {'key': key, 'policy': _signer('media-upload-policy').dumps({'key': key, 'max_bytes': max_bytes})},
+        }
+
+    def verify_local_upload(self, fields, expires_in):
+        try:
+            policy = _signer('media-upload-policy').loads(fields.get('policy', ''), max_age=expires_in)
+        except BadSignature:
+            return None
+        return policy if policy.get('key') == fields.get('key') else None
+
+class S3Storage:
+    """S3-compatible object store (AWS, MinIO, R2...). Browsers upload and download directly."""
+
+    def __init__(self, bucket, endpoint_url=None, region=None, access_key=None, secret_key=None, public_url=None):
+        if boto3 is None:
+            raise RuntimeError("MEDIA_STORAGE='s3' requires the boto3 package (requirements-s3.txt).")
+        self.bucket = bucket
+        self.public_url = public_url.rstrip('/') if public_url else None
+        self.client = boto3.client('s3', endpoint_url=endpoint_url, region_name=region,
+                                   aws_access_key_id=access_key, aws_secret_access_key=secret_key)
+
+    def save(self, file, key):
+        self.client.upload_fileobj(file.stream if hasattr(file, 'stream') else file, self.bucket, key,
+                                   ExtraArgs={'ContentType': _content_type(key)})
+        return key
+
+    def exists(self, key):
+        try:
+            self.client.head_object(Bucket=self.bucket, Key=key)
+        except self.client.exceptions.ClientError:
+            return False
+        return True
+
+    def delete(self, key):
+        self.client.delete_object(Bucket=self.bucket, Key=key)
+
+    def local_path(self, key):
+        return None
+
+    def list(self, folder):
+        """(key, modified timestamp) of every object under a folder."""
+        for page in self.client.get_paginator('list_objects_v2').paginate(Bucket=self.bucket, Prefix=folder + '/'):
+            for item in page.get('Contents', []):
+                yield item['Key'], item['LastModified'].timestamp()
+
+    def url(self, key):
+        if self.public_url:
+            return f'{self.public_url}/{key}'
+        return self.client.generate_presigned_url('get_object', Params={'Bucket': self.bucket, 'Key': key},
+                                                  ExpiresIn=current_app.config.get('MEDIA_URL_EXPIRES', 3600))
+
+    def presign_upload(self, key, max_bytes, expires_in):
+        content_type = _content_type(key)
+        return self.client.generate_presigned_post(
+            self.bucket, key,
+            Fields={'Content-Type': content_type},
+            Conditions=[{'Content-Type': content_type}, ['content-length-range', 1, max_bytes]],
+            ExpiresIn=expires_in,
+        )
+
+def _signer(salt='media-upload'):
+    return URLSafeTimedSerializer(current_app.config['SECRET_KEY'], salt=salt)
+
+def get_storage():
+    app = current_app._get_current_object()
+    storage = app.extensions.get('media_storage')
+    if storage is None:
+        config = app.config
+        if config.get('MEDIA_STORAGE') == 's3':
+            storage = S3Storage(config['S3_BUCKET'], endpoint_url=config.get('S3_ENDPOINT_URL'),
+                                region=config.get('S3_REGION'), access_key=config.get('S3_ACCESS_KEY_ID'),
+                                secret_key=config.get('S3_SECRET_ACCESS_KEY'), public_url=config.get('MEDIA_PUBLIC_URL'))
+        else:
+            storage = LocalStorage(os.path.join(app.root_path, 'static'))
+        app.extensions['media_storage'] = storage
+    return storage
+
+def media_url(key):
+    """Public URL for a stored media key; used by templates as {{ media_url(...) }}."""
+    if not key:
+        return ''
+    if key in BUNDLED_MEDIA:
+        return url_for('static', filename=key)
+    return get_storage().url(key)
+
+def upload_grant():
+    """Short-lived permission for a visitor on the registration page to upload a logo."""
+    return _signer('registration-upload').dumps('logos')
+
+def verify_upload_grant(grant):
+    try:
+        return _signer('registration-upload').loads(grant or '', max_age=current_app.config.get('MEDIA_UPLOAD_EXPIRES', 3600)) == 'logos'
+    except BadSignature:
+        return False
+
+def upload_token(key):
+    """Signed proof that we issued this key, returned to the form after a direct upload."""
+    return _signer().dumps(key)
+
+def key_from_token(token, folder):
+    """The key behind a direct-upload token, if valid, in the right folder and uploaded."""
+    try:
+        key = _signer().loads(token, max_age=current_app.config.get('MEDIA_UPLOAD_EXPIRES', 3600))
+    except BadSignature:
+        return None
+    if not key.startswith(folder + '/') or not get_storage().exists(key):
+        return None
+    return key
+
+def _referenced_keys():
+    from sqlalchemy import select
+    from app import db
+    from app.models import Vendor, Snack, Ad, ArchivedSnack
+    keys = set()
+    for column in (Vendor.logo_url, Snack.media_url, Snack.poster_url, Ad.media_url, Ad.poster_url,
+                   ArchivedSnack.media_url, ArchivedSnack.poster_url):
+        keys.update(db.session.scalars(select(column).where(column.isnot(None))))
+    return keys
+
+def sweep_unreferenced_uploads(min_age=None, dry_run=False):
+    """Delete uploads no vendor, snack or ad points at; returns their keys.
+
+    Direct uploads are stored before the form that uses them is submitted, so
+    abandoned forms leave files behind. Only files older than min_age seconds
+    (default: twice the upload token lifetime) are touched, as younger ones
+    may still be attached. Only keys made by new_key() are considered, so
+    files shipped in app/static are never deleted.
+    """
+    storage = get_storage()
+    min_age = min_age if min_age is not None else 2 * current_app.config.get('MEDIA_UPLOAD_EXPIRES', 3600)
+    cutoff = time.time() - min_age
+    referenced = _referenced_keys()
+    swept = []
+    for folder in UPLOAD_FOLDERS:
+        for key, modified in list(storage.list(folder)):
+            if modified < cutoff and UPLOAD_KEY.match(key) and key not in referenced:
+                if not dry_run:
+                    storage.delete(key)
+                swept.append(key)
+    return swept
+
+@click.command('sweep-uploads')
+@click.option('--dry-run', is_flag=True, help='List the files without deleting them.')
+@with_appcontext
+def sweep_uploads_command(dry_run):
+    """Delete uploaded media files that nothing refers to."""
+    swept = sweep_unreferenced_uploads(dry_run=dry_run)
+    for key in swept:
+        click.echo(key)
+    click.echo(f"{'Would delete' if dry_run else 'Deleted'} {len(swept)} unreferenced uploads.")
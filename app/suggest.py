@@ -0,0 +1,146 @@
+import heapq
+from bisect import bisect_left, insort
+from datetime import datetime
+from sqlalchemy import select
+from app.indexes import LiveIndex
+from app.models import Vendor, Snack
+from app.queries import FRESH_FOR, fresh_since
+
+SUGGEST_KINDS = ('snack', 'vendor', 'zone')
+
+def _normalize(text):
+    return ' '.join((text or '').lower().split())
+
+class PrefixIndex:
+    """Sorted arrays of (term, text), one per kind, searched with bisect.
+
+    Every word of a text is indexed as a term, so 'cen' finds 'Kano Central'.
+    The same text can come from many rows (ten snacks called 'Suya'), so
+    entries are reference counted and only leave their array at zero.
+    """
+
+    def __init__(self):
+        self._terms = {kind: [] for kind in SUGGEST_KINDS}
+        self._counts = {}
+
+    @staticmethod
+    def _entries(text):
+        normalized = _normalize(text)
+        words = normalized.split(' ')
+        return {(' '.join(words[i:]), text.strip()) for i in range(len(words)) if words[i]}
+
+    def add(self, kind, text):
+        if not _normalize(text):
+            return
+        for entry in self._entries(text):
+            key = (kind,) + entry
+            if key in self._counts:
+                self._counts[key] += 1
+            else:
+                self._counts[key] = 1
+                insort(self._terms[kind], entry)
+
+    def remove(self, kind, text):
+        if not _normalize(text):
+            return
+        terms = self._terms[kind]
+        for entry in self._entries(text):
+            key = (kind,) + entry
+            count = self._counts.get(key, 0)
+            if count > 1:
+                self._counts[key] = count - 1
+            elif count == 1:
+                del self._counts[key]
+                del terms[bisect_left(terms, entry)]
+
+    def _matches(self, kind, prefix):
+        # Walk by index rather than slicing, so a keystroke never copies the array
+        terms = self._terms[kind]
+        for i in range(bisect_left(terms, (prefix,)), len(terms)):
+            term, text = terms[i]
+            if not term.startswith(prefix):
+                return
+            yield term, kind, text
+
+    def search(self, prefix, kinds=SUGGEST_KINDS, limit=10):
+        prefix = _normalize(prefix)
+        results, seen = [], set()
+        if not prefix:
+            return results
+        matches = heapq.merge(*(self._matches(kind, prefix) for kind in SUGGEST_KINDS if kind in kinds))
+        for term, kind, text in matches:
+            if (kind, text.lower()) not in seen:
+                seen.add((kind, text.lower()))
+                results.append({'text': text, 'type': kind})
+                if len(results) >= limit:
+                    break
+        return results
+
+class SuggestIndex(LiveIndex):
+    """Typeahead index over fresh snack names, vendor names and location zones.
+
+    Snacks drop out when they stop being fresh.
+    """
+
+    extension = 'suggest_index'
+    rebuild_setting = 'SUGGEST_REBUILD_SECONDS'
+    rebuild_default = 300
+
+    def _reset(self):
+        self.index = PrefixIndex()
+        self._snacks = {}
+        self._vendors = {}
+
+    def statements(self):
+        return (select(Snack.id, Snack.name, Snack.date_posted).where(Snack.date_posted > fresh_since()),
+                select(Vendor.id, Vendor.business_name, Vendor.location_zone))
+
+    def _load(self, snacks, vendors):
+        for snack_id, name, date_posted in snacks:
+            self._add_snack(snack_id, name, date_posted)
+        for vendor_id, business_name, location_zone in vendors:
+            self._add_vendor(vendor_id, business_name, location_zone)
+
+    def _add_snack(self, snack_id, name, date_posted):
+        expires_at = date_posted + FRESH_FOR
+        if expires_at <= datetime.utcnow():
+            return
+        self._snacks[snack_id] = (name, expires_at)
+        self.index.add('snack', name)
+        self._expire_at(snack_id, expires_at)
+
+    def _remove_snack(self, snack_id):
+        if snack_id in self._snacks:
+            self.index.remove('snack', self._snacks.pop(snack_id)[0])
+
+    def _add_vendor(self, vendor_id, business_name, location_zone):
+        self._vendors[vendor_id] = (business_name, location_zone)
+        self.index.add('vendor', business_name)
+        self.index.add('zone', location_zone)
+
+    def _remove_vendor(self, vendor_id):
+        if vendor_id in self._vendors:
+            business_name, location_zone = self._vendors.pop(vendor_id)
+            self.index.remove('vendor', business_name)
+            self.index.remove('zone', location_zone)
+
+    def _expires_at(self, snack_id):
+        return self._snacks.get(snack_id, (None, None))[1]
+
+    def _apply(self, changes):
+        for kind, action, row_id, values in changes:
+            if kind == 'snack':
+                self._remove_snack(row_id)
+                if action == 'upsert':
+                    self._add_snack(row_id, values['name'], values['date_posted'])
+            elif kind == 'vendor':
+                self._remove_vendor(row_id)
+                if action == 'upsert':
+                    self._add_vendor(row_id, values['business_name'], values['location_zone'])
+
+    def suggest(self, prefix, kinds=SUGGEST_KINDS, limit=10):
+        with self._lock:
+            self._expire()
+            return self.index.search(prefix, kinds, limit)
+
+get_suggest_index = SuggestIndex.get
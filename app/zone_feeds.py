@@ -0,0 +1,136 @@
+from bisect import bisect_left, insort
+from datetime import datetime
+from sqlalchemy import select
+from app.indexes import LiveIndex
+from app.models import Vendor, Snack
+from app.queries import FRESH_FOR, fresh_since
+
+ALL = ('all', '')
+
+def _key(text):
+    return (text or '').strip().lower()
+
+def feed_rows_statements():
+    """(snacks, vendors) statements a ZoneFeeds is loaded from; run sync or async."""
+    return (select(Snack.id, Snack.date_posted, Snack.vendor_id).where(Snack.date_posted > fresh_since()),
+            select(Vendor.id, Vendor.location_zone, Vendor.state))
+
+class ZoneFeeds(LiveIndex):
+    """Fresh snack ids per location zone, per state and overall, newest first.
+
+    Materialized in memory so the home page and zone searches read a ready
+    list instead of filtering the 24h feed with a join, and the facet counts
+    are list lengths instead of GROUP BY queries.
+    """
+
+    extension = 'zone_feeds'
+    rebuild_setting = 'ZONE_FEED_REBUILD_SECONDS'
+
+    def _reset(self):
+        self._feeds = {}    # ('zone'|'state'|'all', key) -> sorted [(date_posted, snack_id)]
+        self._labels = {}   # ('zone'|'state', key) -> name as vendors wrote it, while it has a feed
+        self._vendors = {}  # vendor_id -> (zone, state)
+        self._snacks = {}   # snack_id -> (date_posted, vendor_id)
+
+    def statements(self):
+        return feed_rows_statements()
+
+    def _load(self, snack_rows, vendor_rows):
+        for vendor_id, zone, state in vendor_rows:
+            self._set_vendor(vendor_id, zone, state)
+        for snack_id, date_posted, vendor_id in snack_rows:
+            self._add_snack(snack_id, date_posted, vendor_id)
+
+    def _feed_keys(self, vendor_id):
+        zone, state = self._vendors[vendor_id]
+        return [('zone', _key(zone)), ('state', _key(state)), ALL]
+
+    def _set_vendor(self, vendor_id, zone, state):
+        self._vendors[vendor_id] = (zone, state)
+
+    def _add_snack(self, snack_id, date_posted, vendor_id):
+        expires_at = date_posted + FRESH_FOR
+        if vendor_id not in self._vendors or expires_at <= datetime.utcnow():
+            return
+        self._snacks[snack_id] = (date_posted, vendor_id)
+        zone, state = self._vendors[vendor_id]
+        for key, label in zip(self._feed_keys(vendor_id), (zone, state, None)):
+            if key not in self._feeds and label is not None:
+                self._labels[key] = label.strip()
+            insort(self._feeds.setdefault(key, []), (date_posted, snack_id))
+        self._expire_at(snack_id, expires_at)
+
+    def _remove_snack(self, snack_id):
+        if snack_id not in self._snacks:
+            return
+        date_posted, vendor_id = self._snacks.pop(snack_id)
+        for key in self._feed_keys(vendor_id):
+            feed = self._feeds[key]
+            del feed[bisect_left(feed, (date_posted, snack_id))]
+            if not feed:
+                del self._feeds[key]
+                self._labels.pop(key, None)
+
+    def _expires_at(self, snack_id):
+        snack = self._snacks.get(snack_id)
+        return snack[0] + FRESH_FOR if snack else None
+
+    def _apply(self, changes):
+        # Vendors first, so a snack posted by a vendor created in the same commit finds its zone
+        for kind, action, row_id, values in sorted(changes, key=lambda change: change[0] != 'vendor'):
+            if kind == 'snack':
+                self._remove_snack(row_id)
+                if action == 'upsert':
+                    self._add_snack(row_id, values['date_posted'], values['vendor_id'])
+            if kind != 'vendor':
+                continue
+            moved = self._vendors.get(row_id) != (values and (values['location_zone'], values['state']))
+            if not moved:
+                continue
+            snacks = [(snack_id, date_posted) for snack_id, (date_posted, vendor_id) in self._snacks.items()
+                      if vendor_id == row_id]
+            for snack_id, _ in snacks:
+                self._remove_snack(snack_id)
+            self._vendors.pop(row_id, None)
+            if action == 'upsert':
+                self._set_vendor(row_id, values['location_zone'], values['state'])
+                for snack_id, date_posted in snacks:
+                    self._add_snack(snack_id, date_posted, row_id)
+
+    def snack_ids(self, zone=None, state=None):
+        """Fresh snack ids, newest first, for a zone, else a state, else everywhere."""
+        key = ('zone', _key(zone)) if zone else ('state', _key(state)) if state else ALL
+        with self._lock:
+            self._expire()
+            return [snack_id for _, snack_id in reversed(self._feeds.get(key, []))]
+
+    def zone_search_ids(self, zone):
+        """snack_ids() for a zone search, or None when the feed can't stand in for it.
+
+        The search matches every zone containing the text, so the feed is only
+        used when no other zone with fresh snacks contains it as well.
+        """
+        key = _key(zone)
+        if not key or '%' in key or '_' in key:  # LIKE wildcards in the search text
+            return None
+        with self._lock:
+            self._expire()
+            if ('zone', key) not in self._feeds:
+                return None
+            if any(kind == 'zone' and other != key and key in other for kind, other in self._feeds):
+                return None
+            return [snack_id for _, snack_id in reversed(self._feeds[('zone', key)])]
+
+    def facets(self):
+        """{'zones': [(name, count)], 'states': [...]} for zones/states with fresh snacks, busiest first."""
+        with self._lock:
+            self._expire()
+            facets = {'zones': [], 'states': []}
+            for (kind, key), feed in self._feeds.items():
+                if kind != 'all':
+                    facets[kind + 's'].append((self._labels[(kind, key)], len(feed)))
+        for counts in facets.values():
+            counts.sort(key=lambda facet: (-facet[1], facet[0].lower()))
+        return facets
+
+get_zone_feeds = ZoneFeeds.get
@@ -0,0 +1,121 @@
+"""Compare the read path under the gevent (WSGI) and async (ASGI) deployments.
+
+Starts each server in turn on the same database, hammers the public read
+routes with concurrent keep-alive clients and prints throughput and latency
+percentiles. Needs gunicorn and the packages in requirements-async.txt.
+
+    python benchmarks/read_path.py --concurrency 50 --duration 20
+    python benchmarks/read_path.py --only asgi --paths / /search_vendors?business_name=a
+"""
+import argparse
+import http.client
+import os
+import signal
+import statistics
+import subprocess
+import sys
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SERVERS = {
+    'gevent': ['gunicorn', '--bind', '127.0.0.1:{port}', '--worker-class', 'gevent',
+               '--workers', '{workers}', '--worker-connections', '1000', 'app:create_app()'],
+    'asgi': ['uvicorn', 'app.asgi:create_asgi_app', '--factory', '--host', '127.0.0.1', '--port', '{port}',
+             '--workers', '{workers}', '--log-level', 'warning', '--no-access-log'],
+}
+
+DEFAULT_PATHS = ['/', '/search?location_zone=a&snack_type=a', '/search_vendors?business_name=a', '/vendor/1']
+
+def wait_for(port, timeout=30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            conn = http.client.HTTPConnection('127.0.0.1', port, timeout=1)
+            conn.request('GET', '/')
+            conn.getresponse().read()
+            return True
+        except OSError:
+            time.sleep(0.2)
+    return False
+
+def client(port, paths, stop_at, latencies, errors):
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=10)
+    i = 0
+    while time.time() < stop_at:
+        path = paths[i % len(paths)]
+        i += 1
+        start = time.perf_counter()
+        try:
+            conn.request('GET', path)
+            response = conn.getresponse()
+            response.read()
+            if not 200 <= response.status < 300:
+                errors.append(response.status)
+                continue
+        except (OSError, http.client.HTTPException):
+            errors.append('conn')
+            conn.close()
+            conn = http.client.HTTPConnection('127.0.0.1', port, timeout=10)
+            continue
+        latencies.append(time.perf_counter() - start)
+    conn.close()
+
+def run_load(port, paths, concurrency, duration):
+    latencies, errors = [], []
+    stop_at = time.time() + duration
+    threads = [threading.Thread(target=client, args=(port, paths, stop_at, latencies, errors))
+               for _ in range(concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return latencies, errors
+
+def percentile(values, pct):
+    return values[min(len(values) - 1, int(len(values) * pct / 100))] * 1000
+
+def report(name, latencies, errors, duration):
+    latencies.sort()
+    if not latencies:
+        print(f'{name:8} no successful requests ({len(errors)} errors)')
+        return
+    print(f'{name:8} {len(latencies) / duration:8.1f} req/s  '
+          f'p50 {percentile(latencies, 50):7.1f}ms  p95 {percentile(latencies, 95):7.1f}ms  '
+          f'p99 {percentile(latencies, 99):7.1f}ms  mean {statistics.mean(latencies) * 1000:7.1f}ms  '
+          f'errors {len(errors)}')
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--only', choices=sorted(SERVERS))
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--workers', type=int, default=1)
+    parser.add_argument('--concurrency', type=int, default=20)
+    parser.add_argument('--duration', type=float, default=10)
+    parser.add_argument('--warmup', type=float, default=2)
+    parser.add_argument('--paths', nargs='+', default=DEFAULT_PATHS)
+    args = parser.parse_args()
+
+    # Every client connects from 127.0.0.1, so the per-IP limiter would
+    # answer most of the load with 429s.
+    env = dict(os.environ, RATELIMIT_ENABLED='0')
+    for name in [args.only] if args.only else list(SERVERS):
+        cmd = [part.format(port=args.port, workers=args.workers) for part in SERVERS[name]]
+        server = subprocess.Popen(cmd, cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+        try:
+            if not wait_for(args.port):
+                print(f'{name:8} failed to start: {server.stderr.read().decode() if server.poll() is not None else "timeout"}')
+                continue
+            run_load(args.port, args.paths, args.concurrency, args.warmup)
+            latencies, errors = run_load(args.port, args.paths, args.concurrency, args.duration)
+            report(name, latencies, errors, args.duration)
+        finally:
+            server.send_signal(signal.SIGTERM)
+            try:
+                server.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                server.kill()
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,74 @@
+"""Store conversation pairs lowest id first
+
+Revision ID: 833cd0376270
+Revises: f56b8f7350fd
+Create Date: 2026-10-18 23:15:40.853503
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '833cd0376270'
+down_revision = 'f56b8f7350fd'
+branch_labels = None
+depends_on = None
+
+
+SIDES = ('unread', 'last_read_id')
+
+
+def upgrade():
+    # Conversations were stored as (vendor contacted, vendor who opened the chat),
+    # so a pair could exist in both orientations. Merge those into the older row,
+    # then store every pair lowest id first.
+    conn = op.get_bind()
+    rows = conn.execute(sa.text(
+        'SELECT id, vendor_id, customer_id, last_message, last_message_at, last_sender_id, '
+        'vendor_unread, customer_unread, vendor_last_read_id, customer_last_read_id '
+        'FROM conversation ORDER BY id'
+    )).mappings().all()
+    kept = {}
+    for row in rows:
+        sides = {row[role + '_id']: {field: row[f'{role}_{field}'] for field in SIDES}
+                 for role in ('vendor', 'customer')}
+        pair = tuple(sorted(sides))
+        keeper = kept.get(pair)
+        if keeper is None:
+            kept[pair] = {'id': row['id'], 'sides': sides, 'last': row}
+            continue
+        conn.execute(sa.text('UPDATE chat_message SET conversation_id = :keeper WHERE conversation_id = :id'),
+                     {'keeper': keeper['id'], 'id': row['id']})
+        conn.execute(sa.text('DELETE FROM conversation WHERE id = :id'), {'id': row['id']})
+        for vendor_id, side in sides.items():
+            keeper['sides'][vendor_id]['unread'] += side['unread']
+            keeper['sides'][vendor_id]['last_read_id'] = max(keeper['sides'][vendor_id]['last_read_id'], side['last_read_id'])
+        if row['last_message_at'] > keeper['last']['last_message_at']:
+            keeper['last'] = row
+
+    for (low, high), keeper in kept.items():
+        conn.execute(sa.text(
+            'UPDATE conversation SET vendor_id = :low, customer_id = :high, '
+            'last_message = :last_message, last_message_at = :last_message_at, last_sender_id = :last_sender_id, '
+            'vendor_unread = :vendor_unread, customer_unread = :customer_unread, '
+            'vendor_last_read_id = :vendor_last_read_id, customer_last_read_id = :customer_last_read_id '
+            'WHERE id = :id'
+        ), {
+            'id': keeper['id'], 'low': low, 'high': high,
+            'last_message': keeper['last']['last_message'],
+            'last_message_at': keeper['last']['last_message_at'],
+            'last_sender_id': keeper['last']['last_sender_id'],
+            'vendor_unread': keeper['sides'][low]['unread'],
+            'customer_unread': keeper['sides'][high]['unread'],
+            'vendor_last_read_id': keeper['sides'][low]['last_read_id'],
+            'customer_last_read_id': keeper['sides'][high]['last_read_id'],
+        })
+
+    with op.batch_alter_table('conversation', schema=None) as batch_op:
+        batch_op.create_check_constraint('ck_conversation_ordered_pair', 'vendor_id < customer_id')
+
+
+def downgrade():
+    with op.batch_alter_table('conversation', schema=None) as batch_op:
+        batch_op.drop_constraint('ck_conversation_ordered_pair', type_='check')
@@ -0,0 +1,60 @@
+"""Rename conversation sides to vendor_a/vendor_b
+
+Revision ID: f88fb5bfff8e
+Revises: 833cd0376270
+Create Date: 2026-10-19 10:02:11.418263
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f88fb5bfff8e'
+down_revision = '833cd0376270'
+branch_labels = None
+depends_on = None
+
+
+# Since pairs are stored lowest id first, neither side is "the vendor" or
+# "the customer": both are vendors.
+RENAMES = (
+    ('vendor_id', 'vendor_a_id'),
+    ('customer_id', 'vendor_b_id'),
+    ('vendor_unread', 'vendor_a_unread'),
+    ('customer_unread', 'vendor_b_unread'),
+    ('vendor_last_read_id', 'vendor_a_last_read_id'),
+    ('customer_last_read_id', 'vendor_b_last_read_id'),
+)
+
+
+def upgrade():
+    with op.batch_alter_table('conversation', schema=None) as batch_op:
+        batch_op.drop_constraint('ck_conversation_ordered_pair', type_='check')
+        batch_op.drop_index('ix_conversation_vendor_last')
+        batch_op.drop_index('ix_conversation_customer_last')
+
+    with op.batch_alter_table('conversation', schema=None) as batch_op:
+        for old, new in RENAMES:
+            batch_op.alter_column(old, new_column_name=new, existing_type=sa.Integer(), existing_nullable=False)
+
+    with op.batch_alter_table('conversation', schema=None) as batch_op:
+        batch_op.create_index('ix_conversation_vendor_a_last', ['vendor_a_id', 'last_message_at'], unique=False)
+        batch_op.create_index('ix_conversation_vendor_b_last', ['vendor_b_id', 'last_message_at'], unique=False)
+        batch_op.create_check_constraint('ck_conversation_ordered_pair', 'vendor_a_id < vendor_b_id')
+
+
+def downgrade():
+    with op.batch_alter_table('conversation', schema=None) as batch_op:
+        batch_op.drop_constraint('ck_conversation_ordered_pair', type_='check')
+        batch_op.drop_index('ix_conversation_vendor_b_last')
+        batch_op.drop_index('ix_conversation_vendor_a_last')
+
+    with op.batch_alter_table('conversation', schema=None) as batch_op:
+        for old, new in RENAMES:
+            batch_op.alter_column(new, new_column_name=old, existing_type=sa.Integer(), existing_nullable=False)
+
+    with op.batch_alter_table('conversation', schema=None) as batch_op:
+        batch_op.create_index('ix_conversation_customer_last', ['customer_id', 'last_message_at'], unique=False)
+        batch_op.create_index('ix_conversation_vendor_last', ['vendor_id', 'last_message_at'], unique=False)
+        batch_op.create_check_constraint('ck_conversation_ordered_pair', 'vendor_id < customer_id')
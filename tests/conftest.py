@@ -0,0 +1,32 @@
+import pytest
+from app import create_app, db
+from app.config import Config
+
+
+@pytest.fixture
+def make_app(tmp_path):
+    """Build an app on a throwaway SQLite database; keyword arguments override Config."""
+    apps = []
+
+    def make(**overrides):
+        settings = dict(
+            TESTING=True,
+            SQLALCHEMY_DATABASE_URI=f"sqlite:///{tmp_path / 'primary.db'}",
+            SQLALCHEMY_REPLICA_URIS=[],
+            WTF_CSRF_ENABLED=False,
+            PROFILER_DIR=str(tmp_path / 'profiles'),
+            LOAD_SHED_MAX_IN_FLIGHT=0,
+        )
+        settings.update(overrides)
+        app = create_app(type('TestConfig', (Config,), settings))
+        with app.app_context():
+            db.create_all(bind_key=None)
+        apps.append(app)
+        return app
+
+    yield make
+    for app in apps:
+        with app.app_context():
+            db.session.remove()
+            for engine in db.engines.values():
+                engine.dispose()
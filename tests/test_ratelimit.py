@@ -0,0 +1,65 @@
+import pytest
+from app import ratelimit
+from app.ratelimit import LocalSharedBuckets
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1_000_000.0
+
+    def time(self):
+        return self.now
+
+    def monotonic(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(ratelimit, 'time', clock)
+    return clock
+
+
+def test_bucket_is_shared_between_connections(tmp_path, clock):
+    path = str(tmp_path / 'ratelimit.db')
+    first, second = LocalSharedBuckets(path), LocalSharedBuckets(path)
+
+    assert first.take('ip:1.2.3.4', rate=1, burst=2) == (True, 0)
+    assert second.take('ip:1.2.3.4', rate=1, burst=2) == (True, 0)
+    allowed, retry_after = first.take('ip:1.2.3.4', rate=1, burst=2)
+    assert not allowed
+    assert retry_after == pytest.approx(1)
+    # Other clients have their own bucket
+    assert second.take('ip:5.6.7.8', rate=1, burst=2) == (True, 0)
+
+
+def test_bucket_refills_at_the_rate_up_to_the_burst(tmp_path, clock):
+    path = str(tmp_path / 'ratelimit.db')
+    first, second = LocalSharedBuckets(path), LocalSharedBuckets(path)
+    for _ in range(2):
+        assert first.take('ip:1.2.3.4', rate=2, burst=2)[0]
+
+    clock.now += 0.25
+    allowed, retry_after = second.take('ip:1.2.3.4', rate=2, burst=2)
+    assert not allowed
+    assert retry_after == pytest.approx(0.25)
+
+    clock.now += 0.25
+    assert second.take('ip:1.2.3.4', rate=2, burst=2)[0]
+    assert not first.take('ip:1.2.3.4', rate=2, burst=2)[0]
+
+    # A long idle spell refills to the burst and no further
+    clock.now += 60
+    assert [second.take('ip:1.2.3.4', rate=2, burst=2)[0] for _ in range(3)] == [True, True, False]
+
+
+def test_limit_is_shared_by_apps_on_one_file(make_app, tmp_path, clock):
+    settings = dict(RATELIMIT_STORAGE='local', RATELIMIT_LOCAL_PATH=str(tmp_path / 'ratelimit.db'))
+    # Two workers on one host
+    clients = [make_app(**settings).test_client(), make_app(**settings).test_client()]
+
+    statuses = [clients[i % 2].get('/search_vendors?business_name=a').status_code for i in range(25)]
+
+    assert statuses.count(429) == 5
+    assert 429 not in statuses[:20]
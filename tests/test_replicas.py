@@ -0,0 +1,67 @@
+from datetime import datetime, timedelta
+from sqlalchemy import create_engine
+from app import db
+from app.models import Vendor, ReplicaHeartbeat
+
+
+def _seed(uri, business_name, heartbeat):
+    """Give a database the schema, one vendor and the heartbeat row."""
+    engine = create_engine(uri)
+    db.metadata.create_all(engine)
+    with engine.begin() as conn:
+        conn.execute(ReplicaHeartbeat.__table__.insert().values(id=1, updated_at=heartbeat))
+        conn.execute(Vendor.__table__.insert().values(
+            id=1, business_name=business_name, contact_name='Amina', whatsapp_number='08000000001',
+            location_zone='Sabon Gari', state='Kano', email='amina@example.com', password='x',
+            logo_url='logos/default.png', referral_code='ABCDE12345'))
+    engine.dispose()
+
+
+def _replicated_app(make_app, tmp_path, primary_heartbeat, replica_heartbeat):
+    """A primary and a replica SQLite file whose vendor names differ, so a page shows which one served it."""
+    primary_uri = f"sqlite:///{tmp_path / 'primary.db'}"
+    replica_uri = f"sqlite:///{tmp_path / 'replica.db'}"
+    _seed(primary_uri, 'Primary Suya', primary_heartbeat)
+    _seed(replica_uri, 'Replica Suya', replica_heartbeat)
+    return make_app(SQLALCHEMY_DATABASE_URI=primary_uri, SQLALCHEMY_REPLICA_URIS=[replica_uri],
+                    REPLICA_CHECK_INTERVAL=0, REPLICA_MAX_LAG=10)
+
+
+def test_reads_go_to_an_up_to_date_replica(make_app, tmp_path):
+    heartbeat = datetime.utcnow() - timedelta(minutes=5)
+    app = _replicated_app(make_app, tmp_path, heartbeat, heartbeat)
+
+    response = app.test_client().get('/vendor/1')
+
+    assert response.status_code == 200
+    assert b'Replica Suya' in response.data
+
+
+def test_quiet_period_is_not_counted_as_lag(make_app, tmp_path):
+    # Nothing was written for an hour, but the replica has the last heartbeat
+    heartbeat = datetime.utcnow() - timedelta(hours=1)
+    app = _replicated_app(make_app, tmp_path, heartbeat, heartbeat)
+    client = app.test_client()
+
+    assert b'Replica Suya' in client.get('/vendor/1').data
+    assert all(app.extensions['replicas']._health.values())
+
+
+def test_falls_back_to_primary_when_replica_lags(make_app, tmp_path):
+    now = datetime.utcnow()
+    # The replica still shows a heartbeat the primary overwrote a minute ago
+    app = _replicated_app(make_app, tmp_path, now - timedelta(minutes=1), now - timedelta(minutes=2))
+
+    response = app.test_client().get('/vendor/1')
+
+    assert response.status_code == 200
+    assert b'Primary Suya' in response.data
+    assert not any(app.extensions['replicas']._health.values())
+
+
+def test_writes_stay_on_primary(make_app, tmp_path):
+    heartbeat = datetime.utcnow() - timedelta(minutes=5)
+    app = _replicated_app(make_app, tmp_path, heartbeat, heartbeat)
+
+    with app.test_request_context('/vendor/1', method='POST'):
+        assert app.extensions['replicas'].read_engine() is None
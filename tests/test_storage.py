@@ -0,0 +1,66 @@
+import io
+from app import db
+from app.models import Vendor
+from app.storage import LocalStorage, key_from_token
+
+
+def _storage_app(make_app, tmp_path):
+    app = make_app(MEDIA_STORAGE='local')
+    app.extensions['media_storage'] = LocalStorage(str(tmp_path / 'media'))
+    with app.app_context():
+        db.session.add(Vendor(id=1, business_name='Mama Put', contact_name='Amina', whatsapp_number='08000000001',
+                              location_zone='Sabon Gari', state='Kano', email='amina@example.com', password='x'))
+        db.session.commit()
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['vendor_id'] = 1
+    return app, client
+
+
+def _presign(client, filename):
+    response = client.post('/api/uploads/presign', json={'folder': 'snack_media', 'filename': filename})
+    assert response.status_code == 200
+    return response.get_json()
+
+
+def test_presign_upload_and_serve_round_trip(make_app, tmp_path):
+    app, client = _storage_app(make_app, tmp_path)
+    video = bytes(range(256)) * 40
+
+    grant = _presign(client, 'clip.mp4')
+    upload = grant['upload']
+    assert upload['url'] == '/media/upload'
+    response = client.post(upload['url'], data={**upload['fields'], 'file': (io.BytesIO(video), 'clip.mp4')},
+                           content_type='multipart/form-data')
+    assert response.status_code == 204
+
+    with app.test_request_context():
+        key = key_from_token(grant['token'], 'snack_media')
+    assert key == upload['fields']['key']
+
+    response = client.get(f'/media/{key}')
+    assert response.status_code == 200
+    assert response.data == video
+    response = client.get(f'/media/{key}', headers={'Range': 'bytes=100-199'})
+    assert response.status_code == 206
+    assert response.data == video[100:200]
+
+
+def test_upload_rejects_a_tampered_policy(make_app, tmp_path):
+    app, client = _storage_app(make_app, tmp_path)
+    fields = _presign(client, 'clip.mp4')['upload']['fields']
+
+    fields['key'] = 'snack_media/upload-0000000000000000.mp4'
+    response = client.post('/media/upload', data={**fields, 'file': (io.BytesIO(b'x'), 'clip.mp4')},
+                           content_type='multipart/form-data')
+
+    assert response.status_code == 403
+    assert not app.extensions['media_storage'].exists(fields['key'])
+
+
+def test_token_for_a_missing_upload_is_refused(make_app, tmp_path):
+    app, client = _storage_app(make_app, tmp_path)
+    token = _presign(client, 'clip.mp4')['token']
+
+    with app.test_request_context():
+        assert key_from_token(token, 'snack_media') is None